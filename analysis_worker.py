@@ -0,0 +1,107 @@
+import queue
+import threading
+
+from parser_stats import ParserStats
+from parse_trace import TRACE_COMPACT, TRACE_OFF
+from tree_drawer import TreeLayout
+
+# FIRST/FOLLOW rows per 'sets' message
+SETS_BATCH = 500
+# Tokens read between two cancellation checks
+TOKEN_BATCH = 4096
+
+
+class Cancelled(Exception):
+    pass
+
+
+class AnalysisJob:
+    """
+    Runs MainApp's pipeline (analysis, parse, tree layout) on a worker thread.
+
+    Results are put on self.results as (kind, payload) messages, in this order:
+      ('analysis', (parser, cached))
+      ('sets', rows)              - FIRST/FOLLOW rows, SETS_BATCH at a time
+      ('parse', (trace, success)) - trace is a CompactTrace
+      ('tree', layout)            - TreeLayout of the parse tree, partial when rejected
+      ('errors', errors)          - every error (recovering parse), only when rejected
+      ('done', stats)
+    or, at any point, ('cancelled', None) / ('failed', exception) as the last message.
+    cancel() stops the thread at the next stage boundary, or within PROGRESS_TOKENS
+    tokens while reading the input or parsing (also during the recovering parse).
+    """
+
+    # GrammarCache and the parsers it hands out are shared, so one job uses them at a time
+    _lock = threading.Lock()
+
+    def __init__(self, cache, grammar_text, input_string, max_k=1):
+        self.cache = cache
+        self.grammar_text = grammar_text
+        self.input_string = input_string
+        self.max_k = max_k
+        self.results = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _check(self, *args):
+        # Also used as the ParserStats callbacks, so it runs after every stage and
+        # every PROGRESS_TOKENS tokens of a parse
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def _tokens(self):
+        for i, token in enumerate(self.input_string.split()):
+            if i % TOKEN_BATCH == 0:
+                self._check()
+            yield token
+
+    def _run(self):
+        put = self.results.put
+        try:
+            with self._lock:
+                self._check()
+                stats = ParserStats(self._check, self._check)
+                misses = self.cache.misses
+                parser = self.cache.get(self.grammar_text, stats, self.max_k)
+                put(('analysis', (parser, self.cache.misses == misses)))
+
+                rows = []
+                for nt in parser.non_terminals:
+                    f = ", ".join(parser.first[nt])
+                    fl = ", ".join(parser.follow[nt])
+                    rows.append((nt, f"{{ {f} }}", f"{{ {fl} }}"))
+                    if len(rows) == SETS_BATCH:
+                        put(('sets', rows))
+                        rows = []
+                        self._check()
+                if rows:
+                    put(('sets', rows))
+
+                parser.stats = stats
+                try:
+                    trace, success, root_node = parser.parse_tokens(self._tokens(), TRACE_COMPACT, True)
+                    put(('parse', (trace, success)))
+                    put(('tree', TreeLayout.from_tree(root_node)))
+                    if not success:
+                        self._check()
+                        _, errors, _ = parser.parse_with_recovery(self._tokens(), TRACE_OFF, False)
+                        put(('errors', errors))
+                finally:
+                    # The parser is shared through the cache, so detach the stats
+                    parser.stats = None
+                put(('done', stats))
+        except Cancelled:
+            put(('cancelled', None))
+        except Exception as e:
+            put(('failed', e))
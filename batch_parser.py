@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+
+from parse_export import tree_arrays, tree_from_arrays
+from parse_trace import TRACE_OFF
+
+# parse_many(trees=FLAT) returns the trees as the workers send them
+FLAT = 'flat'
+
+# Parser installed in each worker process by _init_worker
+_worker_parser = None
+
+
+def parse_many(parser, inputs, workers=None, chunk_size=None, trees=False, positions=False):
+    """
+    Parses every input with parser (a built LL1ParserLogic) and returns the results
+    in input order. See LL1ParserLogic.parse_many.
+
+    The parser is pickled once per worker through the pool initializer, then inputs
+    are sent in chunks so the per-task overhead is paid once per chunk.
+    Workers send trees back flat, as parse_export.tree_arrays (label table, label
+    ids, child counts): pickling nested TreeNodes recurses once per tree level and
+    fails on deep trees. They are rebuilt into TreeNodes here unless trees is FLAT.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if not isinstance(inputs, (list, tuple)):
+        inputs = list(inputs)
+
+    if workers <= 1 or len(inputs) < 2:
+        results = _parse_chunk_with(parser, inputs, trees, positions)
+        return _unflatten(results) if trees and trees != FLAT else results
+
+    if chunk_size is None:
+        # A few chunks per worker keeps the pool balanced without tiny tasks
+        chunk_size = max(1, len(inputs) // (workers * 4))
+
+    chunks = _chunked(inputs, chunk_size)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(parser,)) as pool:
+        for chunk_results in pool.map(_parse_chunk, chunks, repeat(trees), repeat(positions)):
+            results.extend(chunk_results)
+    return _unflatten(results) if trees and trees != FLAT else results
+
+
+def _init_worker(parser):
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _parse_chunk(chunk, trees, positions):
+    return _parse_chunk_with(_worker_parser, chunk, trees, positions)
+
+
+def _parse_chunk_with(parser, chunk, trees, positions):
+    results = []
+    for item in chunk:
+        tokens = item.split() if isinstance(item, str) else item
+        _, success, root, pointer = parser._parse(tokens, TRACE_OFF, trees)
+        if trees or positions:
+            tree = tree_arrays(root) if root is not None else None
+            results.append((success, None if success or not positions else pointer, tree))
+        else:
+            results.append(success)
+    return results
+
+
+def _unflatten(results):
+    return [(success, position, tree_from_arrays(*tree) if tree is not None else None)
+            for success, position, tree in results]
+
+
+def _chunked(items, size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
@@ -0,0 +1,269 @@
+"""
+Headless benchmark of the parsing pipeline.
+
+Times every stage separately (parse_grammar, remove_left_recursion, left_factor,
+compute_first, compute_follow, build_table, parse_string) on synthetic grammars of growing size
+and on inputs of growing length, and prints the results as JSON.
+
+    python benchmark.py --sizes 10 100 1000 --tokens 10 1000 100000 -o bench.json
+
+By default inputs above --max-steps driver steps are skipped and inputs longer than
+--tree-tokens are parsed without a tree, so the default grid finishes in minutes;
+pass 0 to either to lift the limit.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import grammar_utils
+from bitset_analysis import BACKENDS
+from parser_logic import LL1ParserLogic
+from parser_stats import ParserStats
+
+DEFAULT_SIZES = [10, 100, 1000]
+DEFAULT_TOKENS = [10, 100, 1000, 10000, 100000, 1000000]
+# Tokens of the sample input that steps per token are estimated on
+SAMPLE_TOKENS = 1000
+# Default driver step budget per input, so the default grid finishes: steps per token
+# grow with the grammar size in some families
+DEFAULT_MAX_STEPS = 2000000
+# Inputs longer than this are parsed without a tree by default (a tree node per step)
+DEFAULT_TREE_TOKENS = 100000
+
+
+# --- Synthetic grammars -------------------------------------------------------------
+# Each family returns (grammar_text, make_input) where make_input(n) builds an accepted
+# input string of about n tokens.
+
+def expression_grammar(size):
+    """size precedence levels of left-recursive binary operators (many non-terminals)."""
+    lines = [f"E{i} -> E{i} op{i} E{i + 1} | E{i + 1}" for i in range(size)]
+    lines.append(f"E{size} -> ( E0 ) | id")
+
+    def make_input(n):
+        ops = [f"op{i % size}" for i in range(max(0, n // 2))]
+        return " ".join(["id"] + [f"{op} id" for op in ops])
+
+    return "\n".join(lines), make_input
+
+
+def alternatives_grammar(size, length=8):
+    """One non-terminal with size alternatives of length symbols each (long alternatives)."""
+    alts = [" ".join([f"a{i}"] + [f"x{j}" for j in range(length - 1)]) for i in range(size)]
+    lines = ["S -> A S | ε", f"A -> {' | '.join(alts)}"]
+
+    def make_input(n):
+        items = max(1, n // length)
+        return " ".join(" ".join([f"a{i % size}"] + [f"x{j}" for j in range(length - 1)])
+                        for i in range(items))
+
+    return "\n".join(lines), make_input
+
+
+def nullable_chain_grammar(size):
+    """A chain A0 -> A1 B0, A1 -> A2 B1, ... where every symbol is nullable (deep nullable chains)."""
+    lines = ["L -> ; A0 L | ε"]
+    lines += [f"A{i} -> A{i + 1} B{i}" for i in range(size)]
+    lines += [f"B{i} -> b{i} | ε" for i in range(size)]
+    lines.append(f"A{size} -> c | ε")
+
+    segment = " ".join(["; c"] + [f"b{i}" for i in reversed(range(size))])
+    segment_len = size + 2
+
+    def make_input(n):
+        return " ".join([segment] * max(1, n // segment_len))
+
+    return "\n".join(lines), make_input
+
+
+FAMILIES = {
+    'expression': expression_grammar,
+    'alternatives': alternatives_grammar,
+    'nullable_chain': nullable_chain_grammar,
+}
+
+
+# --- Measurement --------------------------------------------------------------------
+
+def run_pipeline(text, backend='sets'):
+    """Runs every analysis stage once. Returns (parser, {stage: seconds})."""
+    timings = {}
+
+    start = time.perf_counter()
+    grammar, start_symbol, non_terms = grammar_utils.parse_grammar(text)
+    timings['parse_grammar'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grammar, non_terms = grammar_utils.remove_left_recursion(grammar, non_terms)
+    timings['remove_left_recursion'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    grammar, non_terms = grammar_utils.left_factor(grammar, non_terms)
+    timings['left_factor'] = time.perf_counter() - start
+
+    parser = LL1ParserLogic(grammar, start_symbol, non_terms, backend)
+    for stage in ('compute_first', 'compute_follow', 'build_table'):
+        start = time.perf_counter()
+        getattr(parser, stage)()
+        timings[stage] = time.perf_counter() - start
+
+    return parser, timings
+
+
+def pipeline_peaks(text, backend='sets'):
+    """Runs the analysis again under tracemalloc. Returns {stage: peak bytes}."""
+    peaks = {}
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        grammar, start_symbol, non_terms = grammar_utils.parse_grammar(text)
+        peaks['parse_grammar'] = tracemalloc.get_traced_memory()[1]
+
+        tracemalloc.reset_peak()
+        grammar, non_terms = grammar_utils.remove_left_recursion(grammar, non_terms)
+        peaks['remove_left_recursion'] = tracemalloc.get_traced_memory()[1]
+
+        tracemalloc.reset_peak()
+        grammar, non_terms = grammar_utils.left_factor(grammar, non_terms)
+        peaks['left_factor'] = tracemalloc.get_traced_memory()[1]
+
+        parser = LL1ParserLogic(grammar, start_symbol, non_terms, backend)
+        for stage in ('compute_first', 'compute_follow', 'build_table'):
+            tracemalloc.reset_peak()
+            getattr(parser, stage)()
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def measure_parse(parser, input_string, trace_mode, build_tree, memory):
+    start = time.perf_counter()
+    _, success, _ = parser.parse_string(input_string, trace_mode, build_tree)
+    result = {
+        "tokens": len(input_string.split()),
+        "seconds": time.perf_counter() - start,
+        "accepted": success,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            parser.parse_string(input_string, trace_mode, build_tree)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def steps_per_token(parser, make_input):
+    """Driver steps per input token of a family, measured on a short input."""
+    sample = make_input(SAMPLE_TOKENS)
+    stats = ParserStats()
+    parser.stats = stats
+    try:
+        parser.recognize(sample)
+    finally:
+        parser.stats = None
+    return stats.parse_steps / max(1, len(sample.split()))
+
+
+def benchmark_family(name, size, token_counts, repeat, trace_mode, build_tree, memory, backend='sets',
+                     max_steps=None, tree_tokens=None):
+    """
+    Benchmarks one family at one size. With max_steps, inputs whose parse would
+    take more driver steps are skipped: steps per token grow with the grammar size
+    in some families (every id of the expression family walks the whole
+    E0 ... E<size> chain). With tree_tokens, inputs longer than that are parsed
+    without a tree. None runs every input / builds every tree.
+    """
+    text, make_input = FAMILIES[name](size)
+
+    # Best of `repeat` runs for every stage
+    best = None
+    for _ in range(repeat):
+        parser, timings = run_pipeline(text, backend)
+        best = timings if best is None else {k: min(v, best[k]) for k, v in timings.items()}
+
+    stages = {stage: {"seconds": seconds} for stage, seconds in best.items()}
+    if memory:
+        for stage, peak in pipeline_peaks(text, backend).items():
+            stages[stage]["peak_bytes"] = peak
+
+    parses = []
+    rate = steps_per_token(parser, make_input) if max_steps is not None else 0
+    for count in token_counts:
+        if max_steps is not None and count * rate > max_steps:
+            parses.append({"tokens": count, "skipped": f"about {int(count * rate)} steps, above max_steps"})
+            continue
+        input_string = make_input(count)
+        tree = build_tree and (tree_tokens is None or count <= tree_tokens)
+        runs = [measure_parse(parser, input_string, trace_mode, tree, memory and i == 0)
+                for i in range(repeat)]
+        fastest = min(runs, key=lambda r: r["seconds"])
+        if memory:
+            fastest["peak_bytes"] = runs[0]["peak_bytes"]
+        fastest["build_tree"] = tree
+        parses.append(fastest)
+
+    return {
+        "family": name,
+        "size": size,
+        "rules": sum(len(bodies) for bodies in parser.grammar.values()),
+        "non_terminals": len(parser.non_terminals),
+        "terminals": len(parser.terminals),
+        "stages": stages,
+        "parse_string": parses,
+    }
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Benchmark the LL(1) parsing pipeline.")
+    arg_parser.add_argument("--families", nargs="+", choices=sorted(FAMILIES), default=sorted(FAMILIES))
+    arg_parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                            help="grammar sizes (non-terminals / alternatives / chain length)")
+    arg_parser.add_argument("--tokens", nargs="+", type=int, default=DEFAULT_TOKENS,
+                            help="input lengths for parse_string")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    arg_parser.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS,
+                            help="skip inputs whose parse would take more driver steps (0: run all)")
+    arg_parser.add_argument("--backend", default="sets", choices=BACKENDS,
+                            help="FIRST/FOLLOW representation (see bitset_analysis.py)")
+    arg_parser.add_argument("--trace-mode", default="off", choices=("off", "compact", "full"))
+    arg_parser.add_argument("--no-tree", action="store_true", help="parse without building the tree")
+    arg_parser.add_argument("--tree-tokens", type=int, default=DEFAULT_TREE_TOKENS,
+                            help="parse longer inputs without building the tree (0: always build it)")
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    arg_parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = arg_parser.parse_args(argv)
+
+    results = []
+    for name in args.families:
+        for size in args.sizes:
+            results.append(benchmark_family(name, size, args.tokens, args.repeat, args.trace_mode,
+                                            not args.no_tree, not args.no_memory, args.backend,
+                                            args.max_steps or None, args.tree_tokens or None))
+            print(f"{name} size={size} done", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "trace_mode": args.trace_mode,
+        "build_tree": not args.no_tree,
+        "tree_tokens": args.tree_tokens or None,
+        "max_steps": args.max_steps or None,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
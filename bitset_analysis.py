@@ -0,0 +1,325 @@
+"""
+Bitset backends for LL1ParserLogic.compute_first / compute_follow.
+
+Terminals become bit positions and every FIRST / FOLLOW set one bit vector, so a
+union is a single | and "did it grow" a single comparison, instead of building
+and comparing sets of strings in the inner loop. Both sets are closures over a
+graph of non-terminals:
+  FIRST(A)  takes FIRST(X) for every non-terminal X in a nullable prefix of a body of A
+  FOLLOW(B) takes FOLLOW(A) for every A -> ... B whose tail after B is nullable
+on top of what each symbol gets directly (terminals of those prefixes, FIRST of
+the suffixes after B). The graph is condensed into strongly connected
+components, which are visited once in topological order, so every edge costs
+one union.
+
+  'bits'  - Python ints.
+  'numpy' - rows of a packed uint8 matrix (needs NumPy), one row per
+            non-terminal; a component's rows are merged with one reduction. The
+            matrix is kept (PackedBits), one byte per 8 terminals and row.
+
+The bit vectors are the stored form: parser.first_bits / parser.follow_bits
+({symbol: int}, or PackedBits read the same way), with parser.bit_terminals
+naming the bit positions. build_table fills the cells straight from them.
+parser.first / parser.follow are DecodedSets that only turn a set into strings
+when it is looked up (for display, error messages, recovery); an incremental
+edit decodes everything first (decode_sets) and goes on with sets.
+"""
+from collections import defaultdict
+from collections.abc import Mapping
+from itertools import compress
+
+from grammar_utils import nullable_symbols, strongly_connected_components
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SETS = 'sets'
+BITS = 'bits'
+NUMPY = 'numpy'
+BACKENDS = (SETS, BITS, NUMPY)
+
+_DIGIT_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown analysis backend: {backend}")
+    if backend == NUMPY and numpy is None:
+        raise ImportError("The 'numpy' analysis backend needs NumPy installed")
+
+
+def compute_first(parser):
+    """FIRST (and parser.nullable) with the parser's bitset backend."""
+    stats = parser.stats
+    if stats is not None:
+        started = stats.start()
+
+    terminals = sorted(parser.terminals | {'$'})
+    bit = {t: 1 << i for i, t in enumerate(terminals)}
+    bodies_of = [(head, [] if body == ['ε'] else body) for head, body in filter(None, parser.productions)]
+    nullable = nullable_symbols(bodies_of)
+
+    # Direct terminals and X -> A edges through the nullable prefix of every body
+    direct = dict.fromkeys(parser.non_terminals, 0)
+    for head, _ in bodies_of:
+        direct[head] = 0
+    successors = defaultdict(set)
+    for head, body in bodies_of:
+        for symbol in body:
+            if symbol in bit and symbol not in direct:
+                direct[head] |= bit[symbol]
+            elif symbol != head:
+                successors[symbol].add(head)
+            if symbol not in nullable:
+                break
+
+    first_bits = _close(parser.backend, direct, successors, len(terminals))
+
+    parser.nullable = nullable
+    parser.bit_terminals = terminals
+    parser.terminal_bits = bit
+    parser.first_bits = first_bits
+    parser.follow_bits = None
+    parser.first = DecodedSets(terminals, bit, first_bits, nullable)
+
+    if stats is not None:
+        stats.first_iterations += len(first_bits)
+        stats.stop('compute_first', started)
+
+
+def compute_follow(parser):
+    """FOLLOW with the parser's bitset backend."""
+    stats = parser.stats
+    if stats is not None:
+        started = stats.start()
+
+    non_terminals = parser.non_terminals
+    nullable = parser.nullable
+    if nullable is None:
+        nullable = {s for s, fs in parser.first.items() if 'ε' in fs}
+    if parser.first_bits is not None:
+        terminals, bit, first_bits = parser.bit_terminals, parser.terminal_bits, parser.first_bits
+    else:
+        # FIRST came from the set backend (or an incremental edit): encode it once
+        terminals = sorted(parser.terminals | {'$'})
+        bit = {t: 1 << i for i, t in enumerate(terminals)}
+        first_bits = {nt: _encode(parser.first[nt], bit) for nt in non_terminals}
+        parser.bit_terminals = terminals
+        parser.terminal_bits = bit
+        parser.first_bits = first_bits
+
+    direct = dict.fromkeys(non_terminals, 0)
+    direct[parser.start_symbol] = bit['$']
+    successors = defaultdict(set)
+    for head, body in filter(None, parser.productions):
+        if body == ['ε']:
+            continue
+
+        suffix_first = 0
+        suffix_nullable = True
+        for symbol in reversed(body):
+            if symbol in non_terminals:
+                direct[symbol] |= suffix_first
+                if suffix_nullable and symbol != head:
+                    successors[head].add(symbol)
+                symbol_bits = first_bits.get(symbol, 0)
+            else:
+                symbol_bits = bit[symbol]
+
+            # Extend First(suffix) with this symbol
+            if symbol in nullable:
+                suffix_first |= symbol_bits
+            else:
+                suffix_first = symbol_bits
+                suffix_nullable = False
+
+    follow_bits = _close(parser.backend, direct, successors, len(terminals))
+
+    parser.follow_bits = follow_bits
+    parser.follow = DecodedSets(terminals, bit, follow_bits)
+
+    if stats is not None:
+        stats.follow_iterations += len(follow_bits)
+        stats.stop('compute_follow', started)
+
+
+def first_of_bits(parser, body):
+    """Returns: (FIRST(body) - {ε} as bits, whether body is nullable)"""
+    if body == ['ε']:
+        return 0, True
+    bit = parser.terminal_bits
+    first_bits = parser.first_bits
+    nullable = parser.nullable
+    bits = 0
+    for symbol in body:
+        if symbol in bit:
+            return bits | bit[symbol], False
+        bits |= first_bits.get(symbol, 0)
+        if symbol not in nullable:
+            return bits, False
+    return bits, True
+
+
+def terminals_of(parser, bits):
+    """Returns: an iterator over the terminals of bits, lowest bit first."""
+    return _select(parser.bit_terminals, bits)
+
+
+def decode_sets(parser):
+    """
+    Turns parser.first / parser.follow into plain defaultdict(set)s and drops the
+    bit vectors, so code that updates the sets in place (incremental edits) can.
+    """
+    parser.first = defaultdict(set, parser.first.items())
+    parser.follow = defaultdict(set, parser.follow.items())
+    parser.first_bits = parser.follow_bits = None
+
+
+class DecodedSets(Mapping):
+    """
+    FIRST (nullable given) or FOLLOW of a bitset backend, read like the
+    defaultdict(set) of the set backend: looking up a symbol decodes its bits
+    once, and a symbol without bits reads as an empty set.
+    """
+
+    def __init__(self, terminals, bit, bits, nullable=None):
+        self.terminals = terminals
+        self.bit = bit
+        self.bits = bits
+        self.nullable = nullable
+        self._sets = {}
+        self._decode = None
+
+    def __getstate__(self):
+        # Decoded sets are rebuilt on demand
+        state = self.__dict__.copy()
+        state['_sets'] = {}
+        state['_decode'] = None
+        return state
+
+    def __getitem__(self, symbol):
+        symbols = self._sets.get(symbol)
+        if symbols is None:
+            bits = self.bits.get(symbol)
+            if bits is not None:
+                if self._decode is None:
+                    self._decode = _decoder(self.terminals)
+                symbols = self._decode(bits)
+                if self.nullable is not None and symbol in self.nullable:
+                    symbols.add('ε')
+            elif self.nullable is not None and symbol in self.bit:
+                symbols = {symbol}
+            else:
+                symbols = set()
+            self._sets[symbol] = symbols
+        return symbols
+
+    def __contains__(self, symbol):
+        return symbol in self.bits or (self.nullable is not None and symbol in self.bit)
+
+    def __iter__(self):
+        if self.nullable is not None:
+            yield from self.bit
+        yield from self.bits
+
+    def __len__(self):
+        return len(self.bits) + (len(self.bit) if self.nullable is not None else 0)
+
+
+class PackedBits(Mapping):
+    """
+    Bit vectors of the 'numpy' backend: one packed uint8 row per node, in the byte
+    layout of int.to_bytes(..., 'little'). Read like the {node: int} dict of the
+    'bits' backend; a row only becomes an int when it is looked up.
+    """
+
+    def __init__(self, index, rows):
+        self.index = index
+        self.rows = rows
+
+    def __getitem__(self, node):
+        return int.from_bytes(self.rows[self.index[node]].tobytes(), 'little')
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+
+def _close(backend, direct, successors, width):
+    """
+    Returns: {node: bits} where every node has its direct bits ORed with those of
+    all nodes that reach it along successors edges.
+    """
+    # Tarjan lists a component after everything it reaches, so walk the list backwards
+    components = strongly_connected_components(direct, lambda node: successors.get(node, ()))
+    if backend == NUMPY:
+        return _close_matrix(direct, successors, width, components)
+
+    bits = dict(direct)
+    for component in reversed(components):
+        merged = 0
+        for node in component:
+            merged |= bits[node]
+        for node in component:
+            bits[node] = merged
+            for succ in successors.get(node, ()):
+                bits[succ] |= merged
+    return bits
+
+
+def _close_matrix(direct, successors, width, components):
+    nodes = list(direct)
+    index = {node: i for i, node in enumerate(nodes)}
+    size = (width + 7) // 8
+
+    # One little-endian packed row per node, the same byte layout as int.to_bytes
+    rows = numpy.zeros((len(nodes), size), dtype=numpy.uint8)
+    for node, bits in direct.items():
+        if bits:
+            rows[index[node]] = numpy.frombuffer(bits.to_bytes(size, 'little'), dtype=numpy.uint8)
+
+    for component in reversed(components):
+        members = [index[node] for node in component]
+        if len(members) > 1:
+            merged = numpy.bitwise_or.reduce(rows[members])
+            rows[members] = merged
+        else:
+            merged = rows[members[0]].copy()
+        targets = [index[succ] for node in component for succ in successors.get(node, ())]
+        if targets:
+            rows[targets] |= merged
+
+    return PackedBits(index, rows)
+
+
+def _encode(symbols, bit):
+    bits = 0
+    for symbol in symbols:
+        if symbol in bit:
+            bits |= bit[symbol]
+    return bits
+
+
+def _decoder(terminals):
+    """Returns: a function turning bits into the set of their terminals; equal bits are decoded once."""
+    cache = {}
+
+    def decode(bits):
+        symbols = cache.get(bits)
+        if symbols is None:
+            symbols = cache[bits] = frozenset(_select(terminals, bits))
+        return set(symbols)
+
+    return decode
+
+
+def _select(terminals, bits):
+    # Binary digits, lowest bit first, as 0/1 bytes that compress() can select with
+    return compress(terminals, bin(bits)[:1:-1].encode('ascii').translate(_DIGIT_FLAGS))
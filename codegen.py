@@ -0,0 +1,158 @@
+"""
+Exports a built LL1ParserLogic as a standalone, table-free Python module.
+
+The generated module has no dependency on this package. It is a flat state
+machine: each non-terminal gets a dispatch dict from lookahead terminal to a
+"macro step" that already contains the whole chain of expansions the table would
+make for that lookahead (up to MAX_EXPANSIONS), including matching the lookahead
+itself when the chain ends on it. The driver therefore does one dict lookup per
+macro step instead of one table lookup per expansion.
+
+    python codegen.py grammar.txt generated_parser.py
+"""
+import sys
+
+from compiled_table import NO_RULE
+
+# Limits on how far a macro step is unfolded; bounds the generated module size
+MAX_EXPANSIONS = 16
+MAX_PUSH = 32
+
+
+def macro_step(compiled, nt_id, term_id):
+    """
+    Unfolds the expansions of nt_id under lookahead term_id.
+    Returns (push, consumed): the symbol ids to push (already reversed) and whether the
+    lookahead was matched; or None when the parse must fail at this point.
+    """
+    n_terms = compiled.n_terms
+    pid = compiled.lookup(nt_id, term_id)
+    if pid == NO_RULE:
+        return None
+
+    # seq holds the symbols that replaced nt_id, top of stack first
+    seq = list(compiled.bodies[pid])
+    expansions = 1
+    while seq and seq[0] >= n_terms and expansions < MAX_EXPANSIONS and len(seq) < MAX_PUSH:
+        pid = compiled.lookup(seq[0], term_id)
+        if pid == NO_RULE:
+            return None
+        seq[0:1] = compiled.bodies[pid]
+        expansions += 1
+
+    if seq and seq[0] < n_terms:
+        if seq[0] != term_id:
+            return None  # the next step would be a mismatch
+        if term_id != compiled.end_id:
+            return tuple(reversed(seq[1:])), True
+    return tuple(reversed(seq)), False
+
+
+def generate_parser_module(parser):
+    """Returns the source code of a standalone recognizer for parser's grammar."""
+    compiled = parser.compiled
+    if compiled is None:
+        raise ValueError("build_table() must run before generating a parser")
+    if compiled.lookahead:
+        raise ValueError("Tables with LL(k) lookahead tries cannot be exported; build with max_k=1")
+
+    n_terms = compiled.n_terms
+    rows = []
+    for nt_id in range(n_terms, len(compiled.labels)):
+        row = {}
+        for term_id in range(n_terms):
+            step = macro_step(compiled, nt_id, term_id)
+            if step is not None:
+                row[term_id] = step
+        rows.append(row)
+
+    grammar_lines = []
+    for head, body in filter(None, parser.productions):
+        grammar_lines.append(f"    {head} -> {' '.join(body)}")
+
+    out = []
+    out.append('"""')
+    out.append("LL(1) recognizer generated by codegen.py. Do not edit.")
+    out.append("")
+    out.append("Grammar:")
+    out.extend(line.replace('\\', '\\\\').replace('"""', '\\"\\"\\"') for line in grammar_lines)
+    out.append('"""')
+    out.append("")
+    out.append(f"N_TERMS = {n_terms}")
+    out.append(f"START = {compiled.start_id}")
+    out.append(f"LABELS = {tuple(compiled.labels)!r}")
+    out.append(f"TOKENS = {compiled.term_ids!r}")
+    out.append("")
+    out.append("# Dispatch per symbol id (None for terminals):")
+    out.append("# lookahead -> (symbols to push, lookahead consumed)")
+    out.append("ROWS = (")
+    out.extend(f"    None,  # {compiled.labels[i]}" for i in range(n_terms))
+    for offset, row in enumerate(rows):
+        out.append(f"    {row!r},  # {compiled.labels[n_terms + offset]}")
+    out.append(")")
+    out.append("")
+    out.append(_DRIVER)
+    return "\n".join(out)
+
+
+def write_parser_module(parser, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(generate_parser_module(parser))
+
+
+_DRIVER = '''
+def parse(tokens):
+    """
+    Parses a string or any iterable of tokens ('$' is appended automatically).
+    Returns: (success, position) where position is the number of consumed tokens.
+    """
+    if isinstance(tokens, str):
+        tokens = tokens.split()
+    get = TOKENS.get
+    next_token = iter(tokens).__next__
+
+    def advance():
+        try:
+            return get(next_token(), -1)
+        except StopIteration:
+            return 0
+
+    lookahead = advance()
+    position = 0
+    stack = [0, START]
+    pop = stack.pop
+    push = stack.extend
+    rows = ROWS
+    while True:
+        top = pop()
+        if top < N_TERMS:
+            if top != lookahead:
+                return False, position
+            if top == 0:
+                return True, position
+            position += 1
+            lookahead = advance()
+        else:
+            step = rows[top].get(lookahead)
+            if step is None:
+                return False, position
+            symbols, consumed = step
+            push(symbols)
+            if consumed:
+                position += 1
+                lookahead = advance()
+
+
+def recognize(tokens):
+    """True when tokens (a string or an iterable of tokens) is in the language."""
+    return parse(tokens)[0]
+'''
+
+
+if __name__ == "__main__":
+    from grammar_cache import analyze_grammar
+
+    if len(sys.argv) != 3:
+        sys.exit("usage: python codegen.py GRAMMAR_FILE OUTPUT_MODULE")
+    with open(sys.argv[1], encoding='utf-8') as grammar_file:
+        write_parser_module(analyze_grammar(grammar_file.read()), sys.argv[2])
@@ -0,0 +1,108 @@
+from array import array
+
+# Table cell value meaning "no production"
+NO_RULE = -1
+# Terminal id given to input tokens the grammar does not know
+UNKNOWN_TOKEN = -1
+# Table cell value meaning "predict with the cell's lookahead trie" (LL(k) cells)
+LOOKAHEAD = -2
+
+
+class CompiledTable:
+    """
+    Integer-indexed form of an LL(1) parsing table.
+
+    Symbols are numbered with terminals first (0 .. n_terms-1, '$' is always 0)
+    followed by the non-terminals (n_terms .. n_symbols-1), so the driver can tell
+    them apart with a single comparison. Within each group they keep the order of
+    the grammar's SymbolTable ids when one is given, and are sorted by name
+    otherwise. The table is a dense row-major array with one row per non-terminal
+    and one column per terminal holding a production id.
+    Production bodies are stored as pre-reversed tuples of symbol ids, ready to push.
+    Cells that need more than one token hold LOOKAHEAD; their tries (see
+    lookahead.py) are in self.lookahead, keyed by table index, with terminal ids
+    as keys.
+    """
+
+    def __init__(self, productions, start_symbol, terminals, non_terminals, production_ids, lookahead=None,
+                 symbols=None):
+        if symbols is not None:
+            term_list, nt_list = symbols.partition(terminals, non_terminals)
+        else:
+            term_list = ['$'] + sorted(t for t in terminals if t != '$')
+            nt_list = sorted(non_terminals)
+
+        self.n_terms = len(term_list)
+        self.labels = term_list + nt_list
+        self.symbol_ids = {label: i for i, label in enumerate(self.labels)}
+        self.term_ids = {t: i for i, t in enumerate(term_list)}
+        self.start_id = self.symbol_ids[start_symbol]
+        self.end_id = 0
+
+        self.heads = []
+        self.bodies = []
+        self.push = []
+        for pid, production in enumerate(productions):
+            self.heads.append(-1)
+            self.bodies.append(())
+            self.push.append(())
+            self._set_production(pid, production)
+
+        typecode = 'h' if len(productions) < 2 ** 15 else 'i'
+        n_terms = self.n_terms
+        self.table = array(typecode, [NO_RULE]) * (len(nt_list) * n_terms)
+        for head, row in production_ids.items():
+            self._set_row(head, row)
+
+        self.lookahead = {}
+        for (head, term), trie in (lookahead or {}).items():
+            index = (self.symbol_ids[head] - n_terms) * n_terms + self.term_ids[term]
+            if isinstance(trie, int):
+                self.table[index] = trie
+            else:
+                self.table[index] = LOOKAHEAD
+                self.lookahead[index] = self._compile_trie(trie)
+
+    def update(self, productions, production_ids, pids, rows):
+        """
+        Refreshes the given production ids and table rows in place after an incremental
+        edit. Only valid while the terminal / non-terminal sets are unchanged.
+        """
+        for pid in pids:
+            while pid >= len(self.bodies):
+                self.heads.append(-1)
+                self.bodies.append(())
+                self.push.append(())
+            self._set_production(pid, productions[pid])
+        for head in rows:
+            self._set_row(head, production_ids.get(head, {}))
+
+    def _set_production(self, pid, production):
+        if production is None:
+            # Removed production: keep the slot so later ids do not shift
+            self.heads[pid] = -1
+            self.bodies[pid] = self.push[pid] = ()
+            return
+        head, body = production
+        ids = () if body == ['ε'] else tuple(self.symbol_ids[s] for s in body)
+        self.heads[pid] = self.symbol_ids[head]
+        self.bodies[pid] = ids
+        self.push[pid] = ids[::-1]
+
+    def _set_row(self, head, row):
+        n_terms = self.n_terms
+        base = (self.symbol_ids[head] - n_terms) * n_terms
+        table = self.table
+        table[base:base + n_terms] = array(table.typecode, [NO_RULE]) * n_terms
+        for term, pid in row.items():
+            table[base + self.term_ids[term]] = pid
+
+    def _compile_trie(self, trie):
+        return {self.term_ids[token]: node if isinstance(node, int) else self._compile_trie(node)
+                for token, node in trie.items()}
+
+    def lookup(self, nt_id, term_id):
+        """Returns the production id for (non-terminal, terminal), NO_RULE or LOOKAHEAD."""
+        if term_id < 0:
+            return NO_RULE
+        return self.table[(nt_id - self.n_terms) * self.n_terms + term_id]
@@ -0,0 +1,47 @@
+FIRST = 'FIRST'
+FOLLOW = 'FOLLOW'
+
+
+class LL1Conflict:
+    """
+    Two or more productions of one non-terminal claiming the same table cell.
+    causes[i] tells why productions[i] was put there: 'FIRST' when the terminal is in
+    FIRST of the body, 'FOLLOW' when the body is nullable and the terminal is in
+    FOLLOW of the non-terminal.
+    """
+
+    def __init__(self, non_terminal, terminal):
+        self.non_terminal = non_terminal
+        self.terminal = terminal
+        self.productions = []
+        self.causes = []
+
+    def add(self, body, cause):
+        if body not in self.productions:
+            self.productions.append(body)
+            self.causes.append(cause)
+
+    def kind(self):
+        """'FIRST/FIRST', 'FIRST/FOLLOW' or 'FOLLOW/FOLLOW'."""
+        if len(set(self.causes)) > 1:
+            return f"{FIRST}/{FOLLOW}"
+        return f"{self.causes[0]}/{self.causes[0]}"
+
+    def __str__(self):
+        alternatives = " vs ".join(f"{self.non_terminal} -> {' '.join(body)} ({cause})"
+                                   for body, cause in zip(self.productions, self.causes))
+        return f"[{self.non_terminal}, {self.terminal}] {self.kind()} conflict: {alternatives}"
+
+    def __repr__(self):
+        return f"LL1Conflict({self})"
+
+
+class GrammarConflictError(ValueError):
+    """Raised by build_table(strict=True) when the grammar is not LL(1)."""
+
+    def __init__(self, conflicts):
+        self.conflicts = list(conflicts)
+        lines = [str(c) for c in self.conflicts[:10]]
+        if len(self.conflicts) > 10:
+            lines.append(f"... and {len(self.conflicts) - 10} more")
+        super().__init__("Grammar is not LL(1):\n" + "\n".join(lines))
@@ -0,0 +1,195 @@
+import lookahead
+from compiled_table import NO_RULE, UNKNOWN_TOKEN, LOOKAHEAD
+from parse_tree import TreeNode
+from parser_stats import PROGRESS_TOKENS
+from parse_trace import (TRACE_MODES, TRACE_FULL, TRACE_COMPACT, CompactTrace, ParseError, action_text,
+                         MATCH, ACCEPT, ERROR_MISMATCH, ERROR_NO_RULE, ERROR_UNKNOWN, RECOVER_SKIP, RECOVER_POP)
+
+# Matches after an error before the next error is reported again
+QUIET_MATCHES = 3
+
+
+def parse_with_recovery(parser, tokens, trace_mode, build_tree):
+    """
+    Panic-mode driver behind LL1ParserLogic.parse_with_recovery.
+
+    On an error it either skips the lookahead or pops the top of the stack and
+    carries on, so every step consumes a token, pops a symbol or expands a
+    non-terminal and the whole input is checked in one linear pass:
+      unknown token                  - skip it
+      terminal on top does not match - pop it (as if it had been there)
+      no rule for A and lookahead    - pop A when the lookahead is in FOLLOW(A) or is '$'
+                                       (A's caller can continue from there), else skip it
+      '$' on top but input remains   - skip the rest of the input
+    Expanding and popping do not consume input, so expand/pop cycles could repeat
+    forever on one token (S -> B c S with B nullable pops c, expands S, pops c...).
+    Recovery pops on the same token therefore have to happen at decreasing stack
+    depths; a pop at or above the depth of the previous one skips the token instead.
+    Only the first error of a run of recovery steps is reported, and the run only
+    ends after QUIET_MATCHES tokens have been matched without another error (as
+    yacc does), so one mistake does not cascade into many reports.
+    Returns: (trace, errors, root_node)
+
+    >>> from grammar_cache import analyze_grammar
+    >>> parser = analyze_grammar('S -> a B S | ε | B c S\\nB -> a | ε')
+    >>> [str(e) for e in parser.parse_with_recovery('a')[1]]
+    ['token 0 (a): Error: Mismatch, expected c']
+    """
+    if trace_mode not in TRACE_MODES:
+        raise ValueError(f"Unknown trace mode: {trace_mode}")
+    if parser.compiled is None:
+        raise ValueError("build_table() must run before parsing")
+
+    stats = parser.stats
+    if stats is not None:
+        started = stats.start()
+    steps = 0
+
+    full = trace_mode == TRACE_FULL
+    if full or trace_mode == TRACE_COMPACT:
+        tokens = list(tokens)
+        tokens.append('$')
+        trace = [] if full else CompactTrace(parser.productions, parser.start_symbol, tokens)
+    else:
+        trace = None
+
+    compiled = parser.compiled
+    labels = compiled.labels
+    n_terms = compiled.n_terms
+    table = compiled.table
+    bodies = compiled.bodies
+    term_ids = compiled.term_ids
+    end_id = compiled.end_id
+    follow = parser.follow
+    productions = parser.productions
+
+    stack = [end_id, compiled.start_id]
+    if build_tree:
+        root_obj = TreeNode(parser.start_symbol)
+        nodes = [TreeNode('$'), root_obj]
+    else:
+        root_obj = nodes = None
+
+    tries = compiled.lookahead
+    if tries:
+        token_iter, raw_tokens, ahead = lookahead.token_reader(tokens)
+    else:
+        token_iter = iter(tokens)
+    token = next(token_iter, '$')
+    lookahead_id = term_ids.get(token, UNKNOWN_TOKEN)
+
+    errors = []
+    # Matches still needed before errors are reported again
+    quiet = 0
+    pointer = 0
+    # Token position and stack depth of the last recovery pop
+    pop_pointer = -1
+    pop_depth = 0
+
+    while stack:
+        top = stack[-1]
+        steps += 1
+
+        if full:
+            step_stack = " ".join([labels[s] for s in stack])
+        elif trace is not None:
+            depth = len(stack)
+
+        error = None
+        # (position, token, expected) of an error a lookahead trie found past the lookahead
+        rejected = None
+        if top == lookahead_id:
+            action = ACCEPT if top == end_id else MATCH
+            if quiet:
+                quiet -= 1
+        elif lookahead_id == UNKNOWN_TOKEN:
+            error = ERROR_UNKNOWN
+            action = RECOVER_SKIP
+        elif top < n_terms:
+            error = ERROR_MISMATCH
+            action = RECOVER_SKIP if top == end_id else RECOVER_POP
+        else:
+            cell = (top - n_terms) * n_terms + lookahead_id
+            pid = table[cell]
+            if pid == LOOKAHEAD:
+                pid = lookahead.predict(tries[cell], raw_tokens, ahead, term_ids)
+                if pid == NO_RULE:
+                    offset, accepted = lookahead.rejection(tries[cell], ahead, term_ids)
+                    rejected = (pointer + 1 + offset, ahead[offset], [labels[t] for t in accepted])
+            if pid != NO_RULE:
+                action = pid
+                stack.pop()
+                stack.extend(compiled.push[pid])
+                if nodes is not None:
+                    top_node = nodes.pop()
+                    body = bodies[pid]
+                    if not body:
+                        top_node.children = [TreeNode('ε')]
+                    else:
+                        children = [TreeNode(labels[s]) for s in body]
+                        top_node.children = children
+                        nodes.extend(reversed(children))
+            else:
+                error = ERROR_NO_RULE
+                if lookahead_id == end_id or token in follow[labels[top]]:
+                    action = RECOVER_POP
+                else:
+                    action = RECOVER_SKIP
+
+        if action == RECOVER_POP and lookahead_id != end_id:
+            if pointer == pop_pointer and len(stack) >= pop_depth:
+                action = RECOVER_SKIP
+            else:
+                pop_pointer = pointer
+                pop_depth = len(stack)
+
+        if error is not None:
+            if not quiet:
+                if rejected is None:
+                    rejected = (pointer, token, _expected(compiled, top))
+                position, bad_token, expected = rejected
+                errors.append(ParseError(position, bad_token, error, expected))
+            quiet = QUIET_MATCHES
+
+        if full:
+            trace.append({
+                "stack": step_stack,
+                "input": " ".join(tokens[pointer:]),
+                "action": action_text(action, productions, token)
+            })
+        elif trace is not None:
+            trace.append(action, depth, pointer)
+
+        if action == MATCH or action == RECOVER_SKIP:
+            if action == MATCH:
+                stack.pop()
+                if nodes is not None:
+                    nodes.pop()
+            pointer += 1
+            token = next(token_iter, '$')
+            lookahead_id = term_ids.get(token, UNKNOWN_TOKEN)
+            if stats is not None and pointer % PROGRESS_TOKENS == 0:
+                stats.progress('parse', pointer)
+        elif action == RECOVER_POP:
+            stack.pop()
+            if nodes is not None:
+                nodes.pop()
+        elif action == ACCEPT:
+            break
+
+    if stats is not None:
+        stats.parses += 1
+        stats.parse_steps += steps
+        stats.stop('parse', started)
+
+    return trace, errors, root_obj
+
+
+def _expected(compiled, top):
+    """Labels of the terminals the parser could have accepted with top on the stack."""
+    n_terms = compiled.n_terms
+    if top < n_terms:
+        return [compiled.labels[top]]
+    row = (top - n_terms) * n_terms
+    table = compiled.table
+    return [compiled.labels[t] for t in range(n_terms) if table[row + t] != NO_RULE]
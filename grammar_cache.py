@@ -0,0 +1,156 @@
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import grammar_utils
+from parser_logic import LL1ParserLogic
+
+# Bump whenever the layout of LL1ParserLogic changes so old cache files are ignored
+FORMAT_VERSION = 5
+MAGIC = b'LL1C'
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'll1-parser')
+
+
+def normalize_grammar(text):
+    """Normalizes whitespace so formatting-only edits map to the same cache entry."""
+    lines = (" ".join(line.split()) for line in text.strip().split('\n'))
+    return "\n".join(line for line in lines if line)
+
+
+def grammar_hash(text, max_k=1):
+    normalized = normalize_grammar(text)
+    return hashlib.sha256(f"{FORMAT_VERSION}\n{max_k}\n{normalized}".encode('utf-8')).hexdigest()
+
+
+def analyze_grammar(text, stats=None, backend='sets', max_k=1):
+    """
+    Runs the whole analysis pipeline on raw grammar text.
+    stats (a ParserStats) is attached to the parser while the analysis stages run
+    and detached again before it is returned, since the parser may be cached and shared.
+    backend is the FIRST/FOLLOW representation, see LL1ParserLogic; max_k > 1 lets
+    build_table resolve conflicts with up to max_k tokens of lookahead.
+    Raises ValueError when the text has no production at all.
+    Returns: a built LL1ParserLogic (clean grammar, FIRST/FOLLOW, compiled table)
+    """
+    symbols = grammar_utils.SymbolTable()
+    grammar_dict, start, non_terms = grammar_utils.parse_grammar(text, symbols)
+    if start is None:
+        raise ValueError("The grammar has no productions (expected lines like 'S -> a S | b')")
+    clean_grammar, non_terms = grammar_utils.transform_grammar(grammar_dict, non_terms)
+
+    parser = LL1ParserLogic(clean_grammar, start, non_terms, backend, symbols)
+    parser.stats = stats
+    try:
+        parser.compute_first()
+        parser.compute_follow()
+        parser.build_table(max_k=max_k)
+    finally:
+        parser.stats = None
+    return parser
+
+
+class GrammarCache:
+    """
+    Cache of analyzed grammars keyed by the hash of the normalized grammar text.
+
+    Lookups go to an in-process LRU first, then to a file per grammar in
+    cache_dir, and only run the analysis on a miss. Pass cache_dir=None to keep
+    the cache in memory only.
+
+    A cache file is MAGIC followed by the pickled parser, and loading it unpickles
+    it, which can run arbitrary code: cache_dir must be trusted, i.e. only
+    writable by the user (a missing cache_dir is created with mode 0o700).
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=32):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, text, stats=None, max_k=1):
+        """
+        Returns a built LL1ParserLogic for the grammar text (see analyze_grammar for max_k).
+        stats only records the analysis stages when they actually run (cache miss).
+        Every caller of the same grammar gets the same instance, so it is marked
+        shared and is read-only: the incremental edits refuse it, use parser.copy().
+        """
+        key = grammar_hash(text, max_k)
+        parser = self.cached(key)
+        if parser is None:
+            parser = self.build(key, text, stats, max_k)
+            self.remember(key, parser)
+        return parser
+
+    def cached(self, key):
+        """Returns: the parser for key (a grammar_hash) from the in-process layer, or None."""
+        parser = self.entries.get(key)
+        if parser is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return parser
+
+    def build(self, key, text, stats=None, max_k=1):
+        """
+        Loads the parser for key from disk, or analyzes text and stores it there.
+        Leaves the in-process layer alone, so it can run on another thread than the
+        one using cached() / remember().
+        """
+        parser = self._load(key)
+        if parser is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            parser = analyze_grammar(text, stats, max_k=max_k)
+            self._store(key, parser)
+        return parser
+
+    def remember(self, key, parser):
+        """Puts parser in the in-process layer and marks it shared (see get)."""
+        parser.shared = True
+        self.entries[key] = parser
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """Empties the in-process layer; files on disk are kept."""
+        self.entries.clear()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.ll1')
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.path_for(key), 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                return pickle.load(f)
+        except Exception:
+            # Missing, empty or corrupt file, or one naming classes that were renamed
+            # since: the cache is an optimization only, so fall back to a fresh analysis
+            return None
+
+    def _store(self, key, parser):
+        if self.cache_dir is None:
+            return
+        path = self.path_for(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            # makedirs only applies the mode to the last directory, so create both
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(MAGIC)
+                pickle.dump(parser, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Atomic rename so a concurrent reader never sees half a file
+            os.replace(tmp_path, path)
+        except OSError:
+            # The cache is an optimization only; a read-only disk must not break parsing
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -1,78 +1,469 @@
-def parse_grammar(text):
+from collections import deque
+
+
+class GrammarSyntaxError(ValueError):
+    """A malformed grammar line; line_no is 1-based, or None when no single line is at fault."""
+
+    def __init__(self, message, line_no, line=None):
+        if line_no is None:
+            super().__init__(message)
+        else:
+            super().__init__(f"line {line_no}: {message}: {line.strip()!r}")
+        self.line_no = line_no
+        self.line = line
+
+
+class SymbolTable:
     """
-    Parses raw grammar text into a dictionary.
+    Interns grammar symbols while a grammar is read: every occurrence of a name
+    shares one string object (so symbol comparisons mostly hit the identity check)
+    and gets the integer id of its first occurrence. Given to LL1ParserLogic, the
+    ids become the CompiledTable numbering (see partition).
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            return name
+        return self.names[symbol_id]
+
+    def partition(self, terminals, non_terminals):
+        """
+        Names not seen yet (e.g. the A' of left recursion removal) are interned first,
+        in name order.
+        Returns: (['$'] + terminals, non_terminals), each in id order
+        """
+        ids = self.ids
+        for name in sorted(name for name in terminals | non_terminals if name not in ids):
+            self.intern(name)
+        term_list = ['$'] + [name for name in self.names if name in terminals and name != '$']
+        nt_list = [name for name in self.names if name in non_terminals]
+        return term_list, nt_list
+
+    def __len__(self):
+        return len(self.names)
+
+
+def parse_grammar(text, symbols=None):
+    """
+    Parses raw grammar text into a dictionary, interning the names in symbols.
     Returns: (grammar_dict, start_symbol, non_terminals_set)
     """
+    # Lenient like before: lines without '->' are ignored
+    return load_grammar(text.strip().split('\n'), symbols, strict=False)
+
+
+def load_grammar_file(path, symbols=None, strict=True):
+    """Streams a grammar file line by line, see load_grammar."""
+    with open(path, encoding='utf-8') as f:
+        return load_grammar(f, symbols, strict)
+
+
+def load_grammar(lines, symbols=None, strict=True):
+    """
+    Builds the grammar from any iterable of lines (an open file is read lazily).
+    Only the part after the first '->' of a line is the body, so '->' may be used
+    as a terminal. Lines starting with '#' are comments. Symbol names are interned
+    in symbols (a SymbolTable, a new one if not given).
+    With strict=True malformed lines raise GrammarSyntaxError with their line number.
+    Returns: (grammar_dict, start_symbol, non_terminals_set)
+    """
+    if symbols is None:
+        symbols = SymbolTable()
+    intern = symbols.intern
+
     grammar = {}
     non_terminals = set()
     start_symbol = None
 
-    lines = text.strip().split('\n')
-    for line in lines:
+    for line_no, line in enumerate(lines, 1):
         line = line.strip()
-        if not line: continue
-        if '->' not in line: continue
+        if not line or line.startswith('#'): continue
+
+        head, arrow, body = line.partition('->')
+        if not arrow:
+            if strict:
+                raise GrammarSyntaxError("missing '->'", line_no, line)
+            continue
 
-        head, body = line.split('->')
         head = head.strip()
+        if strict and (not head or len(head.split()) != 1):
+            raise GrammarSyntaxError("the head must be a single symbol", line_no, line)
+        head = intern(head)
 
         if start_symbol is None:
             start_symbol = head
 
-        non_terminals.add(head)
+        bodies = grammar.get(head)
+        if bodies is None:
+            bodies = grammar[head] = []
+            non_terminals.add(head)
 
-        alternatives = [alt.strip().split() for alt in body.split('|')]
-        if head not in grammar:
-            grammar[head] = []
-        grammar[head].extend(alternatives)
+        for alt in body.split('|'):
+            alt_symbols = alt.split()
+            if strict and not alt_symbols:
+                raise GrammarSyntaxError("empty alternative (write ε)", line_no, line)
+            bodies.append([intern(symbol) for symbol in alt_symbols])
+
+    if strict and start_symbol is None:
+        raise GrammarSyntaxError("no productions found (expected lines like 'S -> a S | b')", None)
 
     return grammar, start_symbol, non_terminals
 
 
-def remove_left_recursion(grammar, non_terminals):
+def remove_left_recursion(grammar, non_terminals, max_rules=None):
     """
-    Removes immediate left recursion from the grammar.
+    Removes left recursion from the grammar, including indirect recursion
+    (A -> B x, B -> A y), with the standard ordering algorithm.
+    Only non-terminals that are left recursive are rewritten: the left-corner graph
+    (A -> B when a body of A starts with B) is split into strongly connected
+    components, and substitution A_i -> A_j ... (j < i) only happens inside a
+    component. Empty bodies are treated as ε.
+    Hidden left recursion through a nullable prefix (A -> B A with B =>* ε) is not
+    removed: when substitution repeats a body or outgrows max_rules after an ε body
+    uncovered another member, or the rewritten heads are still left recursive
+    afterwards, a ValueError names the hidden left recursion.
+    Raises ValueError when the grammar would grow beyond max_rules bodies
+    (default: 10 times the original size plus 100).
     Returns: (new_grammar, updated_non_terminals)
     """
-    new_grammar = {}
+    grammar = {head: [body if body else ['ε'] for body in bodies] for head, bodies in grammar.items()}
     updated_non_terminals = set(non_terminals)
-    ordered_heads = list(grammar.keys())
+    taken = _all_symbols(grammar)
+    if max_rules is None:
+        max_rules = 10 * sum(len(bodies) for bodies in grammar.values()) + 100
+
+    # Rank of every non-terminal inside its (left recursive) component
+    position = {head: i for i, head in enumerate(grammar)}
+    component_rank = {}
+    for component in _left_corner_components(grammar):
+        recursive = len(component) > 1 or any(body[0] == component[0] for body in grammar[component[0]])
+        if recursive:
+            ordered = sorted(component, key=position.get)
+            for rank, head in enumerate(ordered):
+                component_rank[head] = (id(component), rank)
 
-    for head in ordered_heads:
+    new_grammar = {}
+    primed = {}
+    rule_count = sum(len(bodies) for bodies in grammar.values())
+    for head in _component_order(grammar, component_rank):
         bodies = grammar[head]
+        if head not in component_rank:
+            new_grammar[head] = bodies
+            continue
+
+        # Substitute bodies that start with an earlier member of the same component.
+        # Their bodies were already rewritten, so each substitution moves forward in the order.
+        component, rank = component_rank[head]
+        expanded = []
+        pending = deque(bodies)
+        substituted = set()
+        hidden = None
+        while pending:
+            body = pending.popleft()
+            first = component_rank.get(body[0])
+            if first is not None and first[0] == component and first[1] < rank:
+                deltas = new_grammar[body[0]]
+                if len(body) > 1 and ['ε'] in deltas and component_rank.get(body[1], (None,))[0] == component:
+                    hidden = (body[0], body[1])
+                key = tuple(body)
+                rule_count += len(deltas) - 1
+                if hidden is not None and (key in substituted or rule_count > max_rules):
+                    raise ValueError(f"Hidden left recursion via nullable prefix at {head}: "
+                                     f"{hidden[0]} can derive ε in front of {hidden[1]}")
+                substituted.add(key)
+                if rule_count > max_rules:
+                    raise ValueError(f"Left recursion removal exceeded {max_rules} rules at {head}")
+                pending.extend(_concat(delta, body[1:]) for delta in deltas)
+            else:
+                expanded.append(body)
+
         recursive = []
         non_recursive = []
-
-        for body in bodies:
+        for body in expanded:
             if body[0] == head:
-                recursive.append(body[1:])  # Alpha
+                if len(body) > 1:
+                    recursive.append(body[1:])  # Alpha (A -> A alone is dropped)
             else:
                 non_recursive.append(body)  # Beta
 
         if not recursive:
-            new_grammar[head] = bodies
-        else:
-            # Create new Non-Terminal A'
-            new_head = head + "'"
-            updated_non_terminals.add(new_head)
-
-            # Rule 1: A -> Beta A'
-            new_grammar[head] = []
-            for beta in non_recursive:
-                if beta == ['ε']:
-                    new_grammar[head].append([new_head])
-                else:
-                    new_grammar[head].append(beta + [new_head])
-
-            # Rule 2: A' -> Alpha A' | ε
-            new_grammar[new_head] = []
-            for alpha in recursive:
-                new_grammar[new_head].append(alpha + [new_head])
-            new_grammar[new_head].append(['ε'])
+            new_grammar[head] = non_recursive
+            continue
+
+        # Create new Non-Terminal A'
+        new_head = _fresh_name(head, taken)
+        updated_non_terminals.add(new_head)
+        primed[head] = new_head
+
+        # Rule 1: A -> Beta A'
+        new_grammar[head] = [_concat(beta, [new_head]) for beta in non_recursive]
+
+        # Rule 2: A' -> Alpha A' | ε
+        new_grammar[new_head] = [alpha + [new_head] for alpha in recursive]
+        new_grammar[new_head].append(['ε'])
+        rule_count += 1
+
+    # Keep the original order of the heads, each new A' right after its A
+    ordered = {}
+    for head in grammar:
+        ordered[head] = new_grammar[head]
+        if head in primed:
+            ordered[primed[head]] = new_grammar[primed[head]]
+
+    # A nullable prefix can leave the rewritten heads left recursive
+    # (A -> A A | ε becomes A -> A', A' -> A A' | ε)
+    if component_rank:
+        productions = [(head, body) for head, bodies in ordered.items() for body in bodies]
+        nullable = nullable_symbols(productions)
+        remaining = left_recursive_symbols(productions, nullable)
+        rewritten = set(component_rank) | set(primed.values())
+        for head in ordered:
+            if head in remaining and head in rewritten:
+                raise ValueError(f"Hidden left recursion via nullable prefix at {head}: "
+                                 f"still left recursive after rewriting")
+    return ordered, updated_non_terminals
+
+
+def left_factor(grammar, non_terminals):
+    """
+    Left factors the grammar: bodies of a head that share a first symbol are
+    replaced by their longest common prefix followed by a new non-terminal
+    (A -> a b | a c  becomes  A -> a A', A' -> b | c). Bodies are grouped by first
+    symbol with a dict, so every body is only looked at again when it was factored.
+    Returns: (new_grammar, updated_non_terminals)
+    """
+    new_grammar = {}
+    updated_non_terminals = set(non_terminals)
+    taken = _all_symbols(grammar)
+
+    for head, bodies in grammar.items():
+        pending = deque([(head, bodies)])
+        while pending:
+            current, current_bodies = pending.popleft()
+
+            # Group by first symbol; identical bodies are only kept once
+            groups = {}
+            for body in current_bodies:
+                key = None if body == ['ε'] or not body else body[0]
+                group = groups.setdefault(key, [])
+                if body not in group:
+                    group.append(body)
+
+            factored = []
+            for key, group in groups.items():
+                if key is None or len(group) == 1:
+                    factored.append(group[0])
+                    continue
+                prefix = _common_prefix(group)
+                new_head = _fresh_name(current, taken)
+                updated_non_terminals.add(new_head)
+                factored.append(prefix + [new_head])
+
+                rests = []
+                for body in group:
+                    rest = body[len(prefix):] or ['ε']
+                    if rest not in rests:
+                        rests.append(rest)
+                pending.append((new_head, rests))
+            new_grammar[current] = factored
 
     return new_grammar, updated_non_terminals
 
 
+def transform_grammar(grammar, non_terminals):
+    """
+    Full clean-up before LL(1) analysis: left recursion removal, then left factoring.
+    Returns: (new_grammar, updated_non_terminals)
+    """
+    grammar, non_terminals = remove_left_recursion(grammar, non_terminals)
+    return left_factor(grammar, non_terminals)
+
+
+def _concat(left, right):
+    """Concatenates two bodies, dropping ε."""
+    body = [s for s in left if s != 'ε'] + [s for s in right if s != 'ε']
+    return body or ['ε']
+
+
+def _common_prefix(bodies):
+    prefix = bodies[0]
+    length = len(prefix)
+    for body in bodies[1:]:
+        i = 0
+        limit = min(length, len(body))
+        while i < limit and body[i] == prefix[i]:
+            i += 1
+        length = i
+    return list(prefix[:length])
+
+
+def _fresh_name(head, taken):
+    name = head + "'"
+    while name in taken:
+        name += "'"
+    taken.add(name)
+    return name
+
+
+def _all_symbols(grammar):
+    taken = set(grammar)
+    for bodies in grammar.values():
+        for body in bodies:
+            taken.update(body)
+    return taken
+
+
+def _left_corner_components(grammar):
+    """Strongly connected components of the left-corner graph A -> B (a body of A starts with B)."""
+    def successors(head):
+        return {body[0] for body in grammar[head] if body and body[0] in grammar}
+
+    return strongly_connected_components(grammar, successors)
+
+
+def nullable_symbols(productions):
+    """
+    Returns: the heads that derive ε, from (head, body) pairs where an ε body is
+    [] or ['ε']. Every body counts down its symbols not yet known to be nullable,
+    so each occurrence is looked at once.
+    """
+    productions = [(head, [] if body == ['ε'] else body) for head, body in productions]
+    nullable = set()
+    remaining = []
+    occurrences = {}
+    queue = []
+    for pid, (head, body) in enumerate(productions):
+        remaining.append(len(body))
+        for symbol in body:
+            occurrences.setdefault(symbol, []).append(pid)
+        if not body and head not in nullable:
+            nullable.add(head)
+            queue.append(head)
+    while queue:
+        symbol = queue.pop()
+        for pid in occurrences.get(symbol, ()):
+            remaining[pid] -= 1
+            head = productions[pid][0]
+            if remaining[pid] == 0 and head not in nullable:
+                nullable.add(head)
+                queue.append(head)
+    return nullable
+
+
+def left_recursive_symbols(productions, nullable):
+    """
+    Returns: the heads A with A =>+ A ..., where the left-corner graph also follows
+    edges past a nullable prefix (A -> B C with B =>* ε gives A -> B and A -> C).
+    """
+    productions = list(productions)
+    corners = {head: set() for head, _ in productions}
+    for head, body in productions:
+        for symbol in body:
+            if symbol in corners:
+                corners[head].add(symbol)
+            if symbol not in nullable:
+                break
+
+    result = set()
+    for component in strongly_connected_components(corners, corners.get):
+        if len(component) > 1 or component[0] in corners[component[0]]:
+            result.update(component)
+    return result
+
+
+def strongly_connected_components(nodes, successors):
+    """
+    Strongly connected components of the graph with edges node -> successors(node),
+    found with an iterative Tarjan so deep graphs do not recurse.
+    A component is listed before every component that has an edge into it.
+    """
+    index = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, edges = work[-1]
+            for succ in edges:
+                if succ not in index:
+                    index[succ] = low[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors(succ))))
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def close_sets(nodes, successors, sets):
+    """
+    Adds to sets[node] the sets of every node that reaches it along the edges
+    node -> successors[node] (a dict of sets). The edges are condensed into strongly
+    connected components, visited once in topological order, so every edge costs
+    one union whatever order the nodes come in.
+    Returns: the number of components.
+    """
+    components = strongly_connected_components(nodes, lambda node: successors.get(node, ()))
+    # A component is listed after everything it reaches, so walk the list backwards
+    for component in reversed(components):
+        merged = set()
+        for node in component:
+            merged |= sets[node]
+        for node in component:
+            sets[node] |= merged
+            for succ in successors.get(node, ()):
+                sets[succ] |= merged
+    return len(components)
+
+
+def _component_order(grammar, component_rank):
+    """Grammar order, except that members of a component come in their rank order."""
+    members = {}
+    for head, (component, rank) in component_rank.items():
+        members.setdefault(component, []).append((rank, head))
+    done = set()
+    for head in grammar:
+        if head not in component_rank:
+            yield head
+            continue
+        component = component_rank[head][0]
+        if component in done:
+            continue
+        done.add(component)
+        for _, member in sorted(members[component]):
+            yield member
+
+
 def format_grammar(grammar):
     """Converts grammar dict back to string for display."""
     res = []
@@ -0,0 +1,318 @@
+from collections import defaultdict
+
+import bitset_analysis
+from grammar_utils import close_sets
+
+
+def symbols_of(body):
+    return [] if body == ['ε'] else body
+
+
+class GrammarIndex:
+    """
+    Reverse indexes over LL1ParserLogic.productions, kept up to date across edits:
+    the production ids of every head, and the ids of the productions whose body
+    contains a given symbol.
+    """
+
+    def __init__(self, productions):
+        self.head_pids = defaultdict(list)
+        self.occurrences = defaultdict(set)
+        for pid, production in enumerate(productions):
+            if production is not None:
+                self.add(pid, *production)
+
+    def add(self, pid, head, body):
+        pids = self.head_pids[head]
+        pids.append(pid)
+        if len(pids) > 1 and pids[-2] > pid:
+            pids.sort()  # a replaced production keeps its (smaller) id
+        for symbol in symbols_of(body):
+            self.occurrences[symbol].add(pid)
+
+    def remove(self, pid, head, body):
+        self.head_pids[head].remove(pid)
+        for symbol in symbols_of(body):
+            self.occurrences[symbol].discard(pid)
+
+
+def apply_edit(parser, head, pid, new_body):
+    """
+    Adds (pid is None), removes (new_body is None) or replaces production pid of head,
+    then updates the analysis of parser in place.
+
+    Only the part of the grammar reachable from the edit through the dependency
+    graph is recomputed:
+      nullable - heads that can become (non-)nullable through the edited head
+      FIRST    - symbols whose FIRST flows from the edited head or a nullable change
+      FOLLOW   - non-terminals next to a changed symbol or in the edited bodies, and
+                 everything their FOLLOW flows into
+      table    - rows of heads whose bodies or FOLLOW were affected
+    Returns: the set of non-terminals whose table row was rebuilt.
+    """
+    if parser.shared:
+        raise ValueError("This parser is shared by a GrammarCache and is read-only; edit a parser.copy()")
+    if parser.first_bits is not None:
+        # Edits update the sets in place
+        bitset_analysis.decode_sets(parser)
+    if parser._index is None:
+        parser._index = GrammarIndex(parser.productions)
+    index = parser._index
+    productions = parser.productions
+    old_body = productions[pid][1] if pid is not None else None
+
+    symbols_changed = _update_grammar(parser, index, head, pid, new_body)
+    if symbols_changed is None:
+        # A symbol switched between terminal and non-terminal: start over
+        full_reanalysis(parser)
+        return set(parser.non_terminals)
+
+    if parser.compiled is None:
+        # Not analyzed yet, so there is nothing to update
+        return set()
+
+    nullable_changed, was_nullable = _update_nullable(parser, index, head)
+    changed_first = _update_first(parser, index, {head} | nullable_changed, was_nullable)
+
+    edited = set(symbols_of(old_body or [])) | set(symbols_of(new_body or []))
+    changed_follow = _update_follow(parser, index, edited, changed_first | nullable_changed, was_nullable)
+
+    if parser.max_k > 1:
+        # Lookahead tries depend on FIRST_k / FOLLOW_k of the whole grammar
+        parser.build_table()
+        return set(parser.non_terminals)
+
+    # Table rows: the edited head, heads whose bodies contain a changed symbol,
+    # and non-terminals whose FOLLOW changed
+    rows = {head} | changed_follow
+    for symbol in changed_first | nullable_changed:
+        rows.update(productions[p][0] for p in index.occurrences[symbol])
+    rows &= parser.non_terminals
+
+    for row in rows:
+        parser._clear_row(row)
+        for p in index.head_pids[row]:
+            parser._add_table_entries(p, row, productions[p][1])
+
+    compiled = parser.compiled
+    edited_pid = pid if pid is not None else len(productions) - 1
+    if symbols_changed or (compiled.table.typecode == 'h' and len(productions) >= 2 ** 15):
+        parser.compile_table()
+    else:
+        compiled.update(productions, parser.production_ids, [edited_pid], rows)
+    return rows
+
+
+def full_reanalysis(parser):
+    """Recomputes terminals, FIRST/FOLLOW and the table from scratch."""
+    parser.terminals = set()
+    for production in parser.productions:
+        if production is not None:
+            for symbol in symbols_of(production[1]):
+                if symbol not in parser.non_terminals:
+                    parser.terminals.add(symbol)
+    parser.terminals.add('$')
+
+    parser.first = defaultdict(set)
+    parser.follow = defaultdict(set)
+    parser.nullable = None
+    parser._index = GrammarIndex(parser.productions)
+    parser.compute_first()
+    parser.compute_follow()
+    parser.build_table()
+
+
+def _update_grammar(parser, index, head, pid, new_body):
+    """
+    Applies the edit to grammar, productions, the index and the symbol sets.
+    Returns whether the terminal / non-terminal sets changed, or None when a symbol
+    changed kind and the analysis has to start over.
+    """
+    productions = parser.productions
+    grammar = parser.grammar
+    changed = False
+    restart = False
+
+    if head not in parser.non_terminals:
+        if head in parser.terminals:
+            restart = True
+        parser.non_terminals.add(head)
+        parser.first[head]
+        changed = True
+
+    bodies = grammar.setdefault(head, [])
+    if pid is not None:
+        old_head, old_body = productions[pid]
+        index.remove(pid, old_head, old_body)
+        position = next(i for i, b in enumerate(bodies) if b is old_body)
+        if new_body is None:
+            del bodies[position]
+        else:
+            bodies[position] = new_body
+        productions[pid] = None if new_body is None else (head, new_body)
+
+        # Terminals that no longer appear anywhere are dropped
+        for symbol in symbols_of(old_body):
+            if symbol in parser.terminals and not index.occurrences[symbol]:
+                parser.terminals.discard(symbol)
+                changed = True
+    else:
+        bodies.append(new_body)
+        productions.append((head, new_body))
+        pid = len(productions) - 1
+
+    if new_body is not None:
+        index.add(pid, head, new_body)
+        for symbol in symbols_of(new_body):
+            if symbol not in parser.non_terminals and symbol not in parser.terminals:
+                parser.terminals.add(symbol)
+                parser.first[symbol] = {symbol}
+                changed = True
+
+    return None if restart else changed
+
+
+def _update_nullable(parser, index, head):
+    productions = parser.productions
+    nullable = parser.nullable
+
+    # Region whose nullability may change: upward from head, through bodies whose
+    # other symbols are all nullable (or in the region themselves)
+    region = {head}
+    queue = [head]
+    while queue:
+        symbol = queue.pop()
+        for p in index.occurrences[symbol]:
+            parent, body = productions[p]
+            if parent not in region and all(s in region or s in nullable for s in body):
+                region.add(parent)
+                queue.append(parent)
+
+    was_nullable = region & nullable
+    nullable -= region
+
+    # Recompute inside the region; everything outside it is already final
+    queue = [nt for nt in region if _has_nullable_body(productions, index, nt, nullable)]
+    nullable.update(queue)
+    while queue:
+        symbol = queue.pop()
+        for p in index.occurrences[symbol]:
+            parent = productions[p][0]
+            if parent in region and parent not in nullable and _has_nullable_body(productions, index, parent, nullable):
+                nullable.add(parent)
+                queue.append(parent)
+
+    changed = {nt for nt in region if (nt in nullable) != (nt in was_nullable)}
+    return changed, was_nullable
+
+
+def _has_nullable_body(productions, index, head, nullable):
+    return any(all(s in nullable for s in symbols_of(productions[p][1])) for p in index.head_pids[head])
+
+
+def _update_first(parser, index, seeds, was_nullable):
+    productions = parser.productions
+    first = parser.first
+    nullable = parser.nullable
+
+    def maybe_nullable(symbol):
+        return symbol in nullable or symbol in was_nullable
+
+    # Region: everything FIRST flows into from the seeds (old or new nullable prefixes)
+    region = set(seeds)
+    queue = list(seeds)
+    while queue:
+        symbol = queue.pop()
+        for p in index.occurrences[symbol]:
+            parent, body = productions[p]
+            if parent in region:
+                continue
+            for s in body:
+                if s == symbol:
+                    region.add(parent)
+                    queue.append(parent)
+                    break
+                if not maybe_nullable(s):
+                    break
+
+    old_first = {nt: first[nt] for nt in region}
+    successors = defaultdict(set)
+    for nt in region:
+        first[nt] = set()
+    for nt in region:
+        target = first[nt]
+        for p in index.head_pids[nt]:
+            for s in symbols_of(productions[p][1]):
+                if s in region:
+                    if s != nt:
+                        successors[s].add(nt)
+                else:
+                    target.update(first[s])
+                    target.discard('ε')
+                if s not in nullable:
+                    break
+
+    # ε is only added below, so the closure moves terminals alone
+    close_sets(list(region), successors, first)
+
+    for nt in region:
+        if nt in nullable:
+            first[nt].add('ε')
+    return {nt for nt in region if first[nt] != old_first[nt]}
+
+
+def _update_follow(parser, index, edited, changed, was_nullable):
+    productions = parser.productions
+    first = parser.first
+    follow = parser.follow
+    nullable = parser.nullable
+    non_terminals = parser.non_terminals
+
+    def maybe_nullable(symbol):
+        return symbol in nullable or symbol in was_nullable
+
+    # Seeds: non-terminals of the edited bodies and those placed before a changed symbol
+    seeds = {s for s in edited if s in non_terminals}
+    for symbol in changed:
+        for p in index.occurrences[symbol]:
+            body = productions[p][1]
+            last = max(i for i, s in enumerate(body) if s == symbol)
+            seeds.update(s for s in body[:last] if s in non_terminals)
+
+    # Region: everything FOLLOW flows into from the seeds (through nullable tails)
+    region = set(seeds)
+    queue = list(seeds)
+    while queue:
+        symbol = queue.pop()
+        for p in index.head_pids[symbol]:
+            for s in reversed(symbols_of(productions[p][1])):
+                if s in non_terminals and s not in region:
+                    region.add(s)
+                    queue.append(s)
+                if not maybe_nullable(s):
+                    break
+
+    old_follow = {nt: follow[nt] for nt in region}
+    for nt in region:
+        follow[nt] = {'$'} if nt == parser.start_symbol else set()
+
+    successors = defaultdict(set)
+    for nt in region:
+        target = follow[nt]
+        for p in index.occurrences[nt]:
+            parent, body = productions[p]
+            for i, s in enumerate(body):
+                if s != nt:
+                    continue
+                suffix_first = parser.first_of(body[i + 1:]) if i + 1 < len(body) else {'ε'}
+                target.update(suffix_first)
+                target.discard('ε')
+                if 'ε' in suffix_first and parent != nt:
+                    if parent in region:
+                        successors[parent].add(nt)
+                    else:
+                        target.update(follow[parent])
+
+    close_sets(list(region), successors, follow)
+
+    return {nt for nt in region if follow[nt] != old_follow[nt]}
@@ -0,0 +1,361 @@
+"""
+Adaptive LL(k) lookahead for the table cells where one token is not enough.
+
+build_table(max_k=k) first fills the LL(1) table as usual. For every conflicted
+cell (A, t) it then tries k = 2, 3, ... max_k: the lookahead strings of A's
+competing productions (FIRST_k of the body followed by FOLLOW_k(A), i.e. strong
+LL(k)) that start with t are put in a trie keyed by the next k-1 tokens. When no
+trie leaf is claimed by two productions, the conflict is resolved and the cell
+predicts through the trie from then on.
+
+Conflicts of left-recursive non-terminals are left alone: no number of tokens
+separates A -> A x from A -> y, and a trie that picked the recursive body anyway
+(e.g. because the other body can never be followed by anything) would make the
+driver expand it forever.
+
+Only those cells carry a trie; the compiled table marks them LOOKAHEAD and every
+other cell keeps the one-token lookup, so the LL(1) parts of a grammar parse at
+the LL(1) speed.
+"""
+import heapq
+from collections import defaultdict, deque
+
+from compiled_table import NO_RULE, UNKNOWN_TOKEN
+from grammar_utils import left_recursive_symbols, strongly_connected_components
+from incremental_analysis import GrammarIndex
+
+
+def concat_k(left, right, k):
+    """{(x + y)[:k]} for x in left, y in right; strings already k long are kept as they are."""
+    result = set()
+    for x in left:
+        if len(x) >= k:
+            result.add(x)
+        else:
+            for y in right:
+                result.add((x + y)[:k])
+    return result
+
+
+def first_k_of(first, body, k):
+    """
+    FIRST_k of a sequence of symbols, from the FIRST_k sets of its symbols.
+    Empty when a symbol derives no terminal string (yet), even after k tokens are
+    known: the sequence as a whole then derives nothing.
+    """
+    result = {()}
+    if body == ['ε']:
+        return result
+    complete = False
+    for symbol in body:
+        strings = first[symbol]
+        if not strings:
+            return set()
+        if not complete:
+            result = concat_k(result, strings, k)
+            complete = all(len(x) >= k for x in result)
+    return result
+
+
+class LookaheadSets:
+    """
+    FIRST_k and FOLLOW_k of one k, computed on demand: FIRST_k only for the symbols
+    reachable from the bodies asked about, FOLLOW_k only for the non-terminals
+    asked about and those whose FOLLOW_k flows into them, so the rest of the
+    grammar costs nothing.
+
+    Both are solved over the strongly connected components of their dependencies,
+    in topological order, with a worklist inside a component (lowest reverse
+    postorder first), so a symbol is only revisited when something it depends on
+    grew. FOLLOW_k only pushes the strings that are new along its edges.
+    """
+
+    def __init__(self, parser, index, k):
+        self.parser = parser
+        self.index = index
+        self.k = k
+        # symbol -> set of token tuples of length <= k (shorter ones end the input)
+        self.first = {}
+        # non-terminal -> set of token tuples; strings shorter than k end with '$'
+        self.follow = {}
+
+    def first_of(self, body):
+        """FIRST_k of a sequence of symbols, see first_k_of."""
+        self._solve_first(body)
+        return first_k_of(self.first, body, self.k)
+
+    def follow_of(self, head):
+        """FOLLOW_k of a non-terminal."""
+        self._solve_follow(head)
+        return self.follow[head]
+
+    def _solve_first(self, symbols):
+        parser = self.parser
+        first = self.first
+        head_pids = self.index.head_pids
+        productions = parser.productions
+
+        # Non-terminals below symbols whose FIRST_k is not known yet
+        pending = []
+        seen = set()
+        stack = [s for s in symbols if s != 'ε']
+        while stack:
+            symbol = stack.pop()
+            if symbol in first or symbol in seen:
+                continue
+            if symbol not in parser.non_terminals:
+                first[symbol] = {(symbol,)}
+                continue
+            seen.add(symbol)
+            pending.append(symbol)
+            for pid in head_pids.get(symbol, ()):
+                stack.extend(s for s in productions[pid][1] if s != 'ε')
+
+        def depends_on(nt):
+            return {s for pid in head_pids.get(nt, ()) for s in productions[pid][1] if s in seen}
+
+        # Tarjan lists a component after the ones it depends on
+        k = self.k
+        for component in strongly_connected_components(pending, depends_on):
+            members = set(component)
+            for nt in component:
+                first[nt] = set()
+            users = defaultdict(set)
+            for nt in component:
+                for s in depends_on(nt) & members:
+                    users[s].add(nt)
+            rank = _reverse_postorder(component, users)
+            queue = [(rank[nt], nt) for nt in component]
+            heapq.heapify(queue)
+            queued = set(component)
+            while queue:
+                nt = heapq.heappop(queue)[1]
+                queued.discard(nt)
+                strings = set()
+                for pid in head_pids.get(nt, ()):
+                    strings |= first_k_of(first, productions[pid][1], k)
+                if not strings <= first[nt]:
+                    first[nt] |= strings
+                    for user in users[nt]:
+                        if user not in queued:
+                            queued.add(user)
+                            heapq.heappush(queue, (rank[user], user))
+
+    def _solve_follow(self, head):
+        if head in self.follow:
+            return
+        parser = self.parser
+        productions = parser.productions
+        occurrences = self.index.occurrences
+        follow = self.follow
+        k = self.k
+
+        # Walk up from head: an occurrence B -> ... X beta adds FIRST_k(beta) to
+        # FOLLOW_k(X), and FOLLOW_k(B) behind the strings of beta shorter than k
+        region = [head]
+        found = {head: {('$',)} if head == parser.start_symbol else set()}
+        targets = defaultdict(list)
+        i = 0
+        while i < len(region):
+            symbol = region[i]
+            i += 1
+            for pid in occurrences.get(symbol, ()):
+                parent, body = productions[pid]
+                for position, s in enumerate(body):
+                    if s != symbol:
+                        continue
+                    strings = self.first_of(body[position + 1:] or ['ε'])
+                    found[symbol].update(x for x in strings if len(x) >= k)
+                    short = {x for x in strings if len(x) < k}
+                    if not short:
+                        continue
+                    if parent in follow:
+                        found[symbol] |= concat_k(short, follow[parent], k)
+                        continue
+                    if parent not in found:
+                        found[parent] = {('$',)} if parent == parser.start_symbol else set()
+                        region.append(parent)
+                    targets[parent].append((symbol, short))
+
+        # Propagate only what is new (delta) along the edges, sources first
+        def successors(nt):
+            return [target for target, _ in targets.get(nt, ())]
+
+        components = strongly_connected_components(region, successors)
+        delta = {nt: set(strings) for nt, strings in found.items()}
+        for nt in region:
+            follow[nt] = found[nt]
+        for component in reversed(components):
+            rank = _reverse_postorder(component, {nt: successors(nt) for nt in component})
+            queue = [(rank[nt], nt) for nt in component if delta[nt]]
+            heapq.heapify(queue)
+            queued = {nt for _, nt in queue}
+            while queue:
+                source = heapq.heappop(queue)[1]
+                queued.discard(source)
+                new, delta[source] = delta[source], set()
+                for target, short in targets.get(source, ()):
+                    strings = concat_k(short, new, k) - follow[target]
+                    if strings:
+                        follow[target] |= strings
+                        delta[target] |= strings
+                        if target in rank and target not in queued:
+                            queued.add(target)
+                            heapq.heappush(queue, (rank[target], target))
+
+
+def _reverse_postorder(component, successors):
+    """
+    Returns: {node: rank} for the nodes of a strongly connected component, in
+    reverse postorder of a depth-first walk along successors (a dict of node
+    lists) inside it. Worklists that pop the lowest rank first see most of a
+    node's inputs before the node, so its set grows in few, large steps.
+    """
+    members = set(component)
+    visited = set()
+    order = []
+    for root in component:
+        if root in visited:
+            continue
+        visited.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            node, edges = work[-1]
+            for succ in edges:
+                if succ in members and succ not in visited:
+                    visited.add(succ)
+                    work.append((succ, iter(successors.get(succ, ()))))
+                    break
+            else:
+                work.pop()
+                order.append(node)
+    return {node: rank for rank, node in enumerate(reversed(order))}
+
+
+def resolve_conflicts(parser, max_k):
+    """
+    Tries to resolve parser.conflicts with up to max_k tokens of lookahead.
+    Resolved conflicts are removed from parser.conflicts. Only the conflicted cells
+    pay for the longer lookahead: FIRST_k / FOLLOW_k are computed for their bodies
+    and heads alone (LookaheadSets).
+    Returns: {(non-terminal, terminal): trie} where a trie maps the next token to
+    either a production id or the trie for the token after it.
+    """
+    tries = {}
+    left_recursive = None
+    index = parser._index
+    for k in range(2, max_k + 1):
+        if not parser.conflicts:
+            break
+        if left_recursive is None:
+            left_recursive = _left_recursive(parser)
+            if index is None:
+                index = GrammarIndex(parser.productions)
+        sets = LookaheadSets(parser, index, k)
+        for key, conflict in list(parser.conflicts.items()):
+            if conflict.non_terminal in left_recursive:
+                # A trie could still pick the recursive body, and the driver would
+                # expand it forever without reading a token
+                continue
+            trie = _build_trie(parser, index, conflict, sets, k)
+            if trie is not None:
+                tries[key] = trie
+                del parser.conflicts[key]
+    return tries
+
+
+def _left_recursive(parser):
+    """Non-terminals A with A =>+ A ... through nullable prefixes."""
+    nullable = parser.nullable
+    if nullable is None:
+        nullable = {s for s, fs in parser.first.items() if 'ε' in fs}
+    return left_recursive_symbols(filter(None, parser.productions), nullable)
+
+
+def _build_trie(parser, index, conflict, sets, k):
+    head = conflict.non_terminal
+    term = conflict.terminal
+    pids = [pid for pid in index.head_pids.get(head, ()) if parser.productions[pid][1] in conflict.productions]
+
+    trie = {}
+    follow = sets.follow_of(head)
+    for pid in pids:
+        body = parser.productions[pid][1]
+        for string in concat_k(sets.first_of(body), follow, k):
+            if string[0] != term:
+                continue
+            # Past the end of the input every further token reads as '$'
+            rest = string[1:] + ('$',) * (k - len(string))
+            node = trie
+            for token in rest[:-1]:
+                node = node.setdefault(token, {})
+            if node.get(rest[-1], pid) != pid:
+                return None  # k tokens are not enough for this cell
+            node[rest[-1]] = pid
+    return _collapse(trie)
+
+
+def _collapse(node):
+    """Replaces every subtrie that can only predict one production by that production id."""
+    if isinstance(node, int):
+        return node
+    for token in node:
+        node[token] = _collapse(node[token])
+    values = list(node.values())
+    if all(isinstance(value, int) for value in values) and len(set(values)) == 1:
+        return values[0]
+    return node
+
+
+def buffered(tokens, ahead):
+    """
+    Iterates tokens, but hands out what predict() already read ahead into the deque
+    ahead first. Drivers use it instead of iter(tokens) when the table has tries.
+    """
+    while True:
+        while ahead:
+            yield ahead.popleft()
+        token = next(tokens, None)
+        if token is None:
+            return
+        yield token
+
+
+def predict(trie, tokens, ahead, term_ids):
+    """
+    Walks trie (compiled: keyed by terminal ids) with the tokens after the current
+    lookahead, reading them into ahead without consuming them.
+    Returns: the production id, or NO_RULE.
+    """
+    node = trie
+    i = 0
+    while True:
+        if i == len(ahead):
+            ahead.append(next(tokens, '$'))
+        node = node.get(term_ids.get(ahead[i], UNKNOWN_TOKEN))
+        i += 1
+        if node is None:
+            return NO_RULE
+        if isinstance(node, int):
+            return node
+
+
+def rejection(trie, ahead, term_ids):
+    """
+    Where the tokens read ahead left trie after predict() returned NO_RULE.
+    Returns: (index in ahead of the token the trie rejected, terminal ids it accepted there).
+    """
+    node = trie
+    for i, token in enumerate(ahead):
+        child = node.get(term_ids.get(token, UNKNOWN_TOKEN))
+        if child is None:
+            return i, sorted(node)
+        node = child
+    raise ValueError("the trie accepts the tokens read ahead")
+
+
+def token_reader(tokens):
+    """Returns: (token iterator for the driver, underlying iterator, read-ahead deque)."""
+    raw = iter(tokens)
+    ahead = deque()
+    return buffered(raw, ahead), raw, ahead
@@ -1,9 +1,20 @@
+import queue
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import grammar_utils
-from parser_logic import LL1ParserLogic
+import parse_export
+from analysis_worker import AnalysisJob
+from grammar_cache import GrammarCache
+from paged_treeview import PagedTreeview
 from tree_drawer import TreeDrawer
 
+# Worker messages handled per after() tick, and the delay between ticks (ms)
+MESSAGES_PER_TICK = 8
+POLL_MS = 30
+# Input tokens shown per simulation row
+INPUT_COLUMN_TOKENS = 50
+
 
 class MainApp:
     def __init__(self, root):
@@ -12,6 +23,13 @@ class MainApp:
         self.root.geometry("1200x800")
 
         self.parser_logic = None
+        self.grammar_cache = GrammarCache()
+        self.job = None
+        # State of the current run, filled in as the worker's results arrive
+        self.cached = False
+        self.success = False
+        self.errors = []
+        self.trace = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -31,8 +49,18 @@ class MainApp:
         self.entry_input.grid(row=1, column=1, sticky="n", padx=5, pady=5)
         self.entry_input.insert(0, "id + id * id")
 
-        # Run Button
+        # Lookahead: conflicts that up to k tokens decide are resolved with LL(k) tries
+        tk.Label(control_frame, text="Lookahead k:").grid(row=0, column=4, sticky="nw")
+        self.spin_k = ttk.Spinbox(control_frame, from_=1, to=4, width=4, state="readonly")
+        self.spin_k.grid(row=1, column=4, sticky="n", padx=5, pady=5)
+        self.spin_k.set(1)
+
+        # Run / Cancel Buttons
         ttk.Button(control_frame, text="Run Complete Parsing", command=self.run_process).grid(row=1, column=2, padx=20)
+        self.btn_cancel = ttk.Button(control_frame, text="Cancel", command=self.cancel_process, state="disabled")
+        self.btn_cancel.grid(row=1, column=3)
+        self.lbl_status = ttk.Label(control_frame, text="")
+        self.lbl_status.grid(row=2, column=0, columnspan=4, sticky="w")
 
         # --- Main Tabs ---
         self.notebook = ttk.Notebook(self.root)
@@ -58,6 +86,11 @@ class MainApp:
         self.tab_tree = ttk.Frame(self.notebook)
         self.notebook.add(self.tab_tree, text="Step 5: Parse Tree")
 
+        frame_tree_files = ttk.Frame(self.tab_tree)
+        frame_tree_files.pack(side="top", fill="x")
+        ttk.Button(frame_tree_files, text="Save Tree...", command=self.save_tree).pack(side="left", padx=5, pady=2)
+        ttk.Button(frame_tree_files, text="Open Tree...", command=self.open_tree).pack(side="left", padx=5, pady=2)
+
         self.canvas_tree = tk.Canvas(self.tab_tree, bg="white", width=1100, height=600, scrollregion=(0, 0, 2000, 2000))
 
         # Scrollbars for canvas
@@ -65,17 +98,27 @@ class MainApp:
         hbar.pack(side="bottom", fill="x")
         vbar = ttk.Scrollbar(self.tab_tree, orient="vertical", command=self.canvas_tree.yview)
         vbar.pack(side="right", fill="y")
-        self.canvas_tree.config(xscrollcommand=hbar.set, yscrollcommand=vbar.set)
         self.canvas_tree.pack(side="left", expand=True, fill="both")
 
+        # The drawer only renders the visible part, so it redraws whenever the view scrolls
         self.tree_drawer = TreeDrawer(self.canvas_tree)
+        self.canvas_tree.config(xscrollcommand=self.tree_drawer.scroll_command(hbar.set),
+                                yscrollcommand=self.tree_drawer.scroll_command(vbar.set))
+
+        # Tab 5: Stats (counters and timings of the last run)
+        self.tab_stats = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab_stats, text="Stats")
+        self.tree_stats = ttk.Treeview(self.tab_stats, columns=("Counter", "Value"), show="headings")
+        self.tree_stats.heading("Counter", text="Counter")
+        self.tree_stats.heading("Value", text="Value")
+        self.tree_stats.pack(fill="both", expand=True)
 
     def setup_analysis_tab(self):
         # Two columns: Clean Grammar | First/Follow
         self.tab_analysis.columnconfigure(0, weight=1)
         self.tab_analysis.columnconfigure(1, weight=1)
 
-        f1 = ttk.LabelFrame(self.tab_analysis, text="Grammar (Left Recursion Removed)")
+        f1 = ttk.LabelFrame(self.tab_analysis, text="Grammar (Left Recursion Removed, Left Factored)")
         f1.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
         self.lbl_clean_grammar = tk.Text(f1, height=15, width=40, state="disabled", bg="#f0f0f0")
         self.lbl_clean_grammar.pack(fill="both", expand=True)
@@ -84,15 +127,20 @@ class MainApp:
         f2.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
 
         cols = ("NT", "First", "Follow")
-        self.tree_sets = ttk.Treeview(f2, columns=cols, show="headings")
+        self.tree_sets = PagedTreeview(f2, columns=cols)
         self.tree_sets.heading("NT", text="Non-Terminal")
         self.tree_sets.heading("First", text="First")
         self.tree_sets.heading("Follow", text="Follow")
         self.tree_sets.pack(fill="both", expand=True)
 
     def setup_simulation_tab(self):
+        frame_trace_files = ttk.Frame(self.tab_sim)
+        frame_trace_files.pack(side="top", fill="x")
+        ttk.Button(frame_trace_files, text="Save Trace (JSON Lines)...",
+                   command=self.save_trace).pack(side="left", padx=5, pady=2)
+
         cols = ("Step", "Stack", "Input", "Action")
-        self.tree_sim = ttk.Treeview(self.tab_sim, columns=cols, show="headings")
+        self.tree_sim = PagedTreeview(self.tab_sim, columns=cols)
         self.tree_sim.heading("Step", text="Step")
         self.tree_sim.column("Step", width=50)
         self.tree_sim.heading("Stack", text="Stack")
@@ -104,52 +152,169 @@ class MainApp:
         raw_grammar = self.txt_grammar.get("1.0", tk.END)
         input_str = self.entry_input.get()
 
+        # The pipeline runs on a worker thread; its results are picked up by poll_job
+        if self.job is not None:
+            self.job.cancel()
+        self.job = AnalysisJob(self.grammar_cache, raw_grammar, input_str, int(self.spin_k.get())).start()
+        self.btn_cancel.config(state="normal")
+        self.lbl_status.config(text="Analyzing grammar...")
+        self.root.after(POLL_MS, self.poll_job, self.job)
+
+    def cancel_process(self):
+        if self.job is not None:
+            self.job.cancel()
+
+    def save_tree(self):
+        if self.tree_drawer.layout is None:
+            messagebox.showinfo("Save Tree", "There is no parse tree to save.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".ll1t",
+                                            filetypes=[("Parse trees", "*.ll1t"), ("All files", "*.*")])
+        if path:
+            self.tree_drawer.layout.save(path)
+
+    def open_tree(self):
+        path = filedialog.askopenfilename(filetypes=[("Parse trees", "*.ll1t"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            self.tree_drawer.load(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Open Tree", str(e))
+
+    def save_trace(self):
+        if self.trace is None:
+            messagebox.showinfo("Save Trace", "There is no parse trace to save.")
+            return
+        path = filedialog.asksaveasfilename(defaultextension=".jsonl",
+                                            filetypes=[("JSON Lines", "*.jsonl"), ("All files", "*.*")])
+        if not path:
+            return
+        # Written on a thread; poll_save reports the outcome back on the Tk thread
+        results = queue.Queue()
+        threading.Thread(target=self._write_trace, args=(self.trace, path, results), daemon=True).start()
+        self.lbl_status.config(text="Saving trace...")
+        self.root.after(POLL_MS, self.poll_save, results)
+
+    @staticmethod
+    def _write_trace(trace, path, results):
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                results.put(('saved', parse_export.write_trace_jsonl(trace, f)))
+        except Exception as e:
+            results.put(('failed', e))
+
+    def poll_save(self, results):
         try:
-            # 1. Parse & Remove Left Recursion (grammar_utils.py)
-            grammar_dict, start, non_terms = grammar_utils.parse_grammar(raw_grammar)
-            clean_grammar, non_terms = grammar_utils.remove_left_recursion(grammar_dict, non_terms)
+            kind, payload = results.get_nowait()
+        except queue.Empty:
+            self.root.after(POLL_MS, self.poll_save, results)
+            return
+        if kind == 'saved':
+            self.lbl_status.config(text=f"Saved {payload} trace steps")
+        else:
+            self.lbl_status.config(text="Saving the trace failed")
+            messagebox.showerror("Save Trace", str(payload))
+
+    def poll_job(self, job):
+        if job is not self.job:
+            return  # replaced by a newer run
+        for _ in range(MESSAGES_PER_TICK):
+            try:
+                kind, payload = job.results.get_nowait()
+            except queue.Empty:
+                break
+            if not self.handle_result(kind, payload):
+                self.job = None
+                self.btn_cancel.config(state="disabled")
+                return
+        self.root.after(POLL_MS, self.poll_job, job)
+
+    def handle_result(self, kind, payload):
+        """Shows one message of the worker. Returns: False once the job is over."""
+        if kind == 'analysis':
+            # 1-3. Parse, Remove Left Recursion & Left Factor, First/Follow, Table
+            # (grammar_cache.py reuses the analysis when this grammar was seen before)
+            self.parser_logic, self.cached = payload
 
             # Display Clean Grammar
             self.lbl_clean_grammar.config(state="normal")
             self.lbl_clean_grammar.delete("1.0", tk.END)
-            self.lbl_clean_grammar.insert("1.0", grammar_utils.format_grammar(clean_grammar))
+            self.lbl_clean_grammar.insert("1.0", grammar_utils.format_grammar(self.parser_logic.grammar))
             self.lbl_clean_grammar.config(state="disabled")
 
-            # 2. Logic (parser_logic.py)
-            self.parser_logic = LL1ParserLogic(clean_grammar, start, non_terms)
-            self.parser_logic.compute_first()
-            self.parser_logic.compute_follow()
-
-            # Display Sets
-            for item in self.tree_sets.get_children(): self.tree_sets.delete(item)
-            for nt in self.parser_logic.non_terminals:
-                f = ", ".join(self.parser_logic.first[nt])
-                fl = ", ".join(self.parser_logic.follow[nt])
-                self.tree_sets.insert("", "end", values=(nt, f"{{ {f} }}", f"{{ {fl} }}"))
+            # Sets arrive in batches
+            self.tree_sets.clear()
+            self.tree_sim.clear()
+            self.trace = None
+            self.tree_drawer.draw(None)
 
             # 3. Table
-            self.parser_logic.build_table()
             self.render_table()
-
-            # 4. Simulation & Tree
-            trace, success, root_node = self.parser_logic.parse_string(input_str)
-
-            # Render Simulation
-            for item in self.tree_sim.get_children(): self.tree_sim.delete(item)
-            for i, step in enumerate(trace):
-                self.tree_sim.insert("", "end", values=(i + 1, step['stack'], step['input'], step['action']))
-
-            # Render Tree
-            self.tree_drawer.draw(root_node)
-
-            if success:
+            conflicts = list(self.parser_logic.conflicts.values())
+            if conflicts:
+                lines = [str(c) for c in conflicts[:10]]
+                if len(conflicts) > 10:
+                    lines.append(f"... and {len(conflicts) - 10} more")
+                messagebox.showwarning(f"Grammar is not LL({self.parser_logic.max_k})",
+                                       "Conflicting table entries (the last production is used):\n\n" + "\n".join(lines))
+            self.lbl_status.config(text="Parsing...")
+
+        elif kind == 'sets':
+            self.tree_sets.append_rows(payload)
+
+        elif kind == 'parse':
+            # 4. Simulation: rows are built from the compact trace only when visible
+            trace, self.success = payload
+            self.trace = trace
+
+            def fetch(start, stop):
+                steps = trace.steps(start, stop, INPUT_COLUMN_TOKENS)
+                return [(start + i + 1, step['stack'], step['input'], step['action'])
+                        for i, step in enumerate(steps)]
+
+            self.tree_sim.set_source(len(trace), fetch)
+            self.lbl_status.config(text="Laying out the parse tree...")
+
+        elif kind == 'tree':
+            # Render Tree (the layout was computed by the worker)
+            self.tree_drawer.show_layout(payload)
+
+        elif kind == 'errors':
+            self.errors = payload
+
+        elif kind == 'done':
+            self.render_stats(payload, self.cached)
+            self.lbl_status.config(text="Done")
+            if self.success:
                 messagebox.showinfo("Success", "String Accepted!")
             else:
-                messagebox.showerror("Failure", "String Rejected or Parsing Error")
-
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            raise e
+                # One recovering pass lists every error, not just the first one
+                lines = [str(e) for e in self.errors[:10]]
+                if len(self.errors) > 10:
+                    lines.append(f"... and {len(self.errors) - 10} more")
+                messagebox.showerror("Failure", "String Rejected or Parsing Error\n\n" + "\n".join(lines))
+            return False
+
+        elif kind == 'cancelled':
+            self.lbl_status.config(text="Cancelled")
+            return False
+
+        elif kind == 'failed':
+            self.lbl_status.config(text="Error")
+            messagebox.showerror("Error", str(payload))
+            return False
+
+        return True
+
+    def render_stats(self, stats, cached):
+        for item in self.tree_stats.get_children(): self.tree_stats.delete(item)
+        if cached:
+            self.tree_stats.insert("", "end", values=("analysis", "cached"))
+        for name, value in stats.as_dict().items():
+            if isinstance(value, float):
+                value = f"{value * 1000:.3f} ms"
+            self.tree_stats.insert("", "end", values=(name, value))
 
     def render_table(self):
         # Dynamic Table Columns
@@ -171,7 +336,12 @@ class MainApp:
             row = [nt]
             for t in terminals:
                 prod = self.parser_logic.parsing_table.get(nt, {}).get(t)
-                row.append(" -> ".join([nt, " ".join(prod)]) if prod else "")
+                cell = " -> ".join([nt, " ".join(prod)]) if prod else ""
+                if (nt, t) in self.parser_logic.conflicts:
+                    cell = "⚠ " + cell
+                elif (nt, t) in self.parser_logic.lookahead:
+                    cell = "LL(k): more tokens decide"  # see lookahead.py
+                row.append(cell)
             self.tree_table.insert("", "end", values=row)
 
         self.tree_table.pack(expand=True, fill="both")
@@ -0,0 +1,113 @@
+from tkinter import ttk
+
+
+class PagedTreeview(ttk.Frame):
+    """
+    Table view whose rows are only turned into Treeview items while visible.
+
+    The rows live outside the widget, either as a list of value tuples
+    (set_rows / append_rows) or behind a fetch(start, stop) callable returning the
+    values of rows start..stop-1 (set_source), e.g. one page of a CompactTrace.
+    The Treeview holds one item per visible line; scrolling reuses those items
+    with the values of the new rows, so a million-row trace costs a few dozen
+    widgets.
+    """
+
+    def __init__(self, parent, columns, row_height=20):
+        super().__init__(parent)
+        # The themed row height when the style sets one, else row_height
+        self.row_height = int(ttk.Style(self).lookup("Treeview", "rowheight") or row_height)
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", selectmode="browse")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.count = 0
+        self.fetch = None
+        self.rows = None
+        self.first = 0
+        self.page = 1
+
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.yview('scroll', -3, 'units'))
+        self.tree.bind("<Button-5>", lambda e: self.yview('scroll', 3, 'units'))
+        self.tree.bind("<Prior>", lambda e: self.yview('scroll', -1, 'pages'))
+        self.tree.bind("<Next>", lambda e: self.yview('scroll', 1, 'pages'))
+
+    def heading(self, column, **options):
+        self.tree.heading(column, **options)
+
+    def column(self, column, **options):
+        self.tree.column(column, **options)
+
+    def set_rows(self, rows):
+        """Shows rows (value tuples), copied into a list of the view's own that append_rows extends."""
+        self.rows = list(rows)
+        self.set_source(len(self.rows), lambda start, stop: self.rows[start:stop])
+
+    def append_rows(self, rows):
+        """Adds rows at the end (progressive loading); only repaints when they are visible."""
+        if self.rows is None:
+            self.set_rows(rows)
+            return
+        visible = self.count < self.first + self.page
+        self.rows.extend(rows)
+        self.count = len(self.rows)
+        if visible:
+            self.refresh()
+        else:
+            self._update_scrollbar()
+
+    def set_source(self, count, fetch):
+        """Shows count rows whose values are produced on demand by fetch(start, stop)."""
+        self.count = count
+        self.fetch = fetch
+        self.first = 0
+        self.refresh()
+
+    def clear(self):
+        self.rows = None
+        self.set_source(0, None)
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units' | 'pages')."""
+        if args[0] == 'moveto':
+            first = int(float(args[1]) * self.count)
+        else:
+            step = self.page if args[2] == 'pages' else 1
+            first = self.first + int(args[1]) * step
+        self.first = max(0, min(first, self.count - self.page))
+        self.refresh()
+
+    def refresh(self):
+        items = self.tree.get_children()
+        start = max(0, min(self.first, self.count - self.page))
+        self.first = start
+        values = self.fetch(start, min(self.count, start + self.page)) if self.count else []
+
+        for i, row in enumerate(values):
+            if i < len(items):
+                self.tree.item(items[i], values=row)
+            else:
+                self.tree.insert("", "end", values=row)
+        if len(items) > len(values):
+            self.tree.delete(*items[len(values):])
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self.count <= self.page:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first / self.count, (self.first + self.page) / self.count)
+
+    def _on_configure(self, event):
+        # Lines that fit below the heading row
+        page = max(1, event.height // self.row_height - 1)
+        if page != self.page:
+            self.page = page
+            self.refresh()
+
+    def _on_wheel(self, event):
+        self.yview('scroll', -3 if event.delta > 0 else 3, 'units')
+        return "break"
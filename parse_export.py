@@ -0,0 +1,228 @@
+"""
+Parse results in forms other tools can read without rebuilding Python objects.
+
+Trees are written in a compact binary format, as the same flat preorder arrays
+TreeLayout uses. All integers are little-endian:
+  header       magic b'LL1T', format version, label count, node count (4 x uint32)
+  label table  byte length (uint32), then the distinct labels as UTF-8 joined by '\\n',
+               zero-padded to a multiple of 4 bytes
+  label ids    node count x int32, index into the label table, in preorder
+  child counts node count x int32
+Both arrays start 4-byte aligned, so a consumer can memory-map the file and view
+them in place (e.g. numpy.frombuffer(mapped, '<i4', count, offset)).
+
+Traces are written as JSON Lines, one compact object per step (see
+JsonlTraceWriter), either while the parse runs (stream_trace) or from a finished
+CompactTrace (write_trace_jsonl).
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from parse_trace import TRACE_COMPACT, MATCH, RECOVER_SKIP, CompactTrace, action_text
+from parse_tree import TreeNode
+
+MAGIC = b'LL1T'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sIII')
+_LENGTH = struct.Struct('<I')
+
+
+def tree_arrays(tree):
+    """
+    Returns: (label table, label ids, child counts) of a TreeNode graph or a
+    TreeLayout, in preorder, with the label table listing every label once.
+    """
+    label_index = {}
+    label_ids = array('i')
+    if hasattr(tree, 'child_counts'):
+        # Already flat
+        for label in tree.labels:
+            label_ids.append(label_index.setdefault(label, len(label_index)))
+        child_counts = array('i', tree.child_counts)
+    else:
+        child_counts = array('i')
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            label_ids.append(label_index.setdefault(node.label, len(label_index)))
+            child_counts.append(len(node.children))
+            stack.extend(reversed(node.children))
+    return list(label_index), label_ids, child_counts
+
+
+def tree_from_arrays(table, label_ids, child_counts):
+    """Rebuilds the TreeNode graph from tree_arrays' output without recursion."""
+    root = None
+    # [children list of an open node, children still missing]
+    pending = []
+    for label_id, count in zip(label_ids, child_counts):
+        node = TreeNode(table[label_id])
+        if pending:
+            top = pending[-1]
+            top[0].append(node)
+            top[1] -= 1
+            if top[1] == 0:
+                pending.pop()
+        else:
+            root = node
+        if count:
+            node.children = []
+            pending.append([node.children, count])
+    return root
+
+
+def write_tree(tree, file):
+    """Writes a TreeNode graph or TreeLayout to file (a path or a binary file object)."""
+    if isinstance(file, str):
+        with open(file, 'wb') as f:
+            write_tree(tree, f)
+        return
+
+    table, label_ids, child_counts = tree_arrays(tree)
+    for label in table:
+        if '\n' in label:
+            raise ValueError(f"Tree label contains a newline: {label!r}")
+    names = '\n'.join(table).encode('utf-8')
+    names += b'\0' * (-len(names) % 4)
+    if sys.byteorder != 'little':
+        label_ids.byteswap()
+        child_counts.byteswap()
+
+    file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(table), len(label_ids)))
+    file.write(_LENGTH.pack(len(names)))
+    file.write(names)
+    file.write(label_ids.tobytes())
+    file.write(child_counts.tobytes())
+
+
+def read_tree_arrays(file):
+    """
+    Reads a tree written by write_tree from a path or a bytes-like object (e.g. an mmap).
+    Returns: (label table, label ids, child counts)
+    """
+    if isinstance(file, str):
+        with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return read_tree_arrays(mapped)
+
+    # Released before returning, so an mmap passed in can be closed afterwards
+    with memoryview(file) as data:
+        return _read_arrays(data)
+
+
+def _read_arrays(data):
+    if len(data) < _HEADER.size + _LENGTH.size:
+        raise ValueError("Not a parse tree file: too short")
+    magic, version, n_labels, n_nodes = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a parse tree file: bad magic")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported parse tree format version: {version}")
+
+    offset = _HEADER.size
+    (names_size,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    names = bytes(data[offset:offset + names_size]).rstrip(b'\0').decode('utf-8')
+    table = names.split('\n') if n_labels else []
+    offset += names_size
+    if len(table) != n_labels or len(data) < offset + 8 * n_nodes:
+        raise ValueError("Truncated parse tree file")
+
+    label_ids = array('i')
+    label_ids.frombytes(data[offset:offset + 4 * n_nodes])
+    offset += 4 * n_nodes
+    child_counts = array('i')
+    child_counts.frombytes(data[offset:offset + 4 * n_nodes])
+    if sys.byteorder != 'little':
+        label_ids.byteswap()
+        child_counts.byteswap()
+    return table, label_ids, child_counts
+
+
+def read_tree(file):
+    """Returns: (labels, child counts) per node in preorder, as TreeLayout takes them."""
+    table, label_ids, child_counts = read_tree_arrays(file)
+    return list(map(table.__getitem__, label_ids)), child_counts
+
+
+class JsonlTraceWriter:
+    """
+    Trace sink that writes every parse step to a text stream as soon as the driver
+    records it, one JSON object per line:
+      {"step": 0, "action": "E -> T E'", "production": 0, "depth": 2, "position": 0, "token": "id"}
+    production is the id of the expanded production or null, depth the stack
+    height before the step and position the index of the lookahead token.
+    The stack itself is not repeated on every line; it follows from the actions.
+    Takes the same append(action, depth, pointer) calls as CompactTrace.
+    """
+
+    def __init__(self, stream, productions):
+        self.stream = stream
+        self.productions = productions
+        self.tokens = None
+        self.count = 0
+        # JSON-encoded strings, built once per production / token
+        self._texts = {}
+        self._encoded_tokens = {}
+
+    def start(self, tokens):
+        """Binds the token list (ending with '$') the steps point into; returns self."""
+        self.tokens = tokens
+        self.count = 0
+        return self
+
+    def append(self, action, depth, pointer):
+        token = self.tokens[pointer]
+        encoded = self._encoded_tokens.get(token)
+        if encoded is None:
+            encoded = self._encoded_tokens[token] = json.dumps(token, ensure_ascii=False)
+        if action == MATCH or action == RECOVER_SKIP:
+            # The text names the token, so it is not shared between steps
+            text = json.dumps(action_text(action, self.productions, token), ensure_ascii=False)
+        else:
+            text = self._texts.get(action)
+            if text is None:
+                text = self._texts[action] = json.dumps(action_text(action, self.productions, token),
+                                                        ensure_ascii=False)
+        production = action if action >= 0 else 'null'
+        self.stream.write(f'{{"step": {self.count}, "action": {text}, "production": {production}, '
+                          f'"depth": {depth}, "position": {pointer}, "token": {encoded}}}\n')
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+
+def stream_trace(parser, tokens, stream, build_tree=False):
+    """
+    Parses tokens (a string or an iterable of tokens) with parser, writing the trace
+    to stream as JSON Lines while the parse runs instead of keeping it in memory.
+    Returns: (success, root_node, steps written)
+    """
+    if isinstance(tokens, str):
+        tokens = tokens.split()
+    writer = JsonlTraceWriter(stream, parser.productions)
+    _, success, root_node, _ = parser._parse(tokens, TRACE_COMPACT, build_tree, writer.start)
+    return success, root_node, len(writer)
+
+
+def write_trace_jsonl(trace, stream):
+    """
+    Writes a finished CompactTrace in the same JSON Lines format, straight from its
+    raw records, so no stack or input strings are built.
+    A full trace (a list of step dicts) does not keep the production ids and
+    positions of its steps and raises TypeError: parse with trace_mode='compact',
+    or use stream_trace.
+    Returns: the number of steps written
+    """
+    if not isinstance(trace, CompactTrace):
+        raise TypeError(f"write_trace_jsonl needs a CompactTrace (trace_mode='compact'), "
+                        f"not {type(trace).__name__}")
+    writer = JsonlTraceWriter(stream, trace.productions).start(trace.tokens)
+    append = writer.append
+    for action, depth, pointer in trace.raw():
+        append(action, depth, pointer)
+    return len(writer)
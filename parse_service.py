@@ -0,0 +1,349 @@
+"""
+Asynchronous parsing service.
+
+ParseService validates inputs against grammars without blocking the event loop:
+  - grammars are analyzed once, on a background thread, and kept in the
+    GrammarCache (its in-process LRU is the grammar pool, keyed by grammar_hash);
+    concurrent requests for a grammar that is still being analyzed wait for the
+    same analysis
+  - parses run in a process pool; requests for the same grammar are collected
+    into batches (up to batch_size inputs, or whatever arrived within
+    batch_delay seconds) so a worker handles many inputs per task
+  - at most max_pending requests are in flight; further callers wait, which
+    gives backpressure instead of an unbounded queue. A socket connection stops
+    reading once connection_pending of its requests are unanswered
+
+Grammar text is read by analyze_grammar, with the same rules as the GUI. Workers
+never analyze: the first batch of a grammar carries the pooled parser, pickled
+once on the analysis thread and kept (up to max_grammars) next to the pool. Later
+batches name their grammar by key only, and a worker that has not seen the key
+yet answers with a miss, upon which the batch is sent again with the kept
+payload. Each worker keeps the parsers it received (up to max_grammars).
+
+It can be used in-process (await service.parse(...)) or over a local socket
+with one JSON object per line:
+
+    request:  {"id": 1, "grammar": "S -> a S | b", "input": "a a b", "recover": false}
+    response: {"id": 1, "accepted": true, "position": null}
+              {"id": 1, "accepted": false, "position": 2, "errors": [...]}  (recover)
+              {"id": 1, "error": "..."}                                     (bad request)
+
+    python parse_service.py --port 8765
+"""
+import argparse
+import asyncio
+import json
+import os
+import pickle
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from grammar_cache import DEFAULT_CACHE_DIR, GrammarCache, grammar_hash
+from parse_trace import TRACE_OFF
+
+DEFAULT_PORT = 8765
+
+# Parsers each worker process received, by grammar key, most recently used last;
+# installed by _init_worker
+_worker_parsers = None
+_worker_max_grammars = 0
+
+
+class ParseService:
+    def __init__(self, workers=None, cache_dir=DEFAULT_CACHE_DIR, max_grammars=32,
+                 max_pending=10000, batch_size=64, batch_delay=0.002, connection_pending=256):
+        """workers=0 parses on a thread of this process instead of a process pool."""
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.max_grammars = max_grammars
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.connection_pending = connection_pending
+
+        # Only this event loop uses the in-process layer of the cache (cached / remember);
+        # the analysis thread only calls build
+        self.cache = GrammarCache(cache_dir, max_grammars)
+        self._analyzing = {}
+        # key -> task pickling the pooled parser for the workers, most recently used last
+        self._payloads = OrderedDict()
+        # (key, recover) -> (parser, [(tokens, future)]) waiting for the next batch
+        self._batches = {}
+        self._in_flight = set()
+        self._slots = asyncio.Semaphore(max_pending)
+
+        # A single analysis thread also keeps GrammarCache single-threaded
+        self._analysis_pool = ThreadPoolExecutor(max_workers=1)
+        if workers > 0:
+            self._parse_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                   initargs=(max_grammars,))
+        else:
+            self._parse_pool = ThreadPoolExecutor(max_workers=1, initializer=_init_worker,
+                                                  initargs=(max_grammars,))
+
+        self.requests = 0
+        self.batches = 0
+        self.analyses = 0
+        self.payloads = 0
+
+    async def parse(self, grammar_text, tokens, recover=False):
+        """
+        Parses tokens (a string or a list of tokens) with the grammar.
+        Returns: {'accepted', 'position'} where position is the token index of the
+        first error (None when accepted); with recover=True also 'errors', every
+        error found by the recovering parser as a string.
+        Raises ValueError when the grammar itself is invalid (no productions, hidden
+        left recursion), like analyze_grammar.
+        """
+        if isinstance(tokens, str):
+            tokens = tokens.split()
+        async with self._slots:
+            self.requests += 1
+            key, parser = await self._pooled(grammar_text)
+            future = asyncio.get_running_loop().create_future()
+            batch_key = (key, recover)
+            if batch_key not in self._batches:
+                self._batches[batch_key] = (parser, [])
+                asyncio.get_running_loop().call_later(self.batch_delay, self._flush, batch_key)
+            batch = self._batches[batch_key][1]
+            batch.append((tokens, future))
+            if len(batch) >= self.batch_size:
+                self._flush(batch_key)
+            return await future
+
+    async def parse_many(self, grammar_text, inputs, recover=False):
+        """Parses every input concurrently. Returns the results in input order."""
+        return await asyncio.gather(*(self.parse(grammar_text, tokens, recover) for tokens in inputs))
+
+    async def grammar_key(self, grammar_text):
+        """Makes sure the grammar is analyzed and in the pool. Returns: its grammar_hash."""
+        return (await self._pooled(grammar_text))[0]
+
+    async def _pooled(self, grammar_text):
+        """Returns: (key, parser), analyzing the grammar if it is not pooled."""
+        key = grammar_hash(grammar_text)
+        parser = self.cache.cached(key)
+        if parser is not None:
+            return key, parser
+
+        task = self._analyzing.get(key)
+        if task is None:
+            task = self._analyzing[key] = asyncio.ensure_future(self._analyze(key, grammar_text))
+        return key, await asyncio.shield(task)
+
+    async def _analyze(self, key, grammar_text):
+        loop = asyncio.get_running_loop()
+        try:
+            parser = await loop.run_in_executor(self._analysis_pool, self.cache.build, key, grammar_text)
+        finally:
+            del self._analyzing[key]
+        self.analyses += 1
+        self.cache.remember(key, parser)
+        return parser
+
+    def _flush(self, batch_key):
+        if batch_key not in self._batches:
+            return  # already sent because it was full
+        parser, batch = self._batches.pop(batch_key)
+        self.batches += 1
+        inputs = [tokens for tokens, _ in batch]
+        futures = [future for _, future in batch]
+        done = asyncio.ensure_future(self._run_batch(batch_key, parser, inputs))
+        self._in_flight.add(done)
+        done.add_done_callback(self._in_flight.discard)
+        done.add_done_callback(lambda f: _deliver(f, futures))
+
+    async def _run_batch(self, batch_key, parser, inputs):
+        key, recover = batch_key
+        loop = asyncio.get_running_loop()
+        if key in self._payloads:
+            self._payloads.move_to_end(key)
+            results = await loop.run_in_executor(self._parse_pool, _parse_batch, key, None, inputs, recover)
+            if results is not None:
+                return results
+        # No worker has the grammar yet, or this one has not seen it: send the payload
+        payload = await asyncio.shield(self._payload(key, parser))
+        return await loop.run_in_executor(self._parse_pool, _parse_batch, key, payload, inputs, recover)
+
+    def _payload(self, key, parser):
+        """Returns: the task pickling parser for the workers, started once per key."""
+        task = self._payloads.get(key)
+        if task is None:
+            # The parser is shared and read-only, so the analysis thread can pickle it
+            self.payloads += 1
+            loop = asyncio.get_running_loop()
+            task = self._payloads[key] = asyncio.ensure_future(loop.run_in_executor(
+                self._analysis_pool, pickle.dumps, parser, pickle.HIGHEST_PROTOCOL))
+            if len(self._payloads) > self.max_grammars:
+                self._payloads.popitem(last=False)
+        return task
+
+    async def close(self):
+        """Sends the open batches, waits for every batch in flight, then shuts the pools down."""
+        for batch_key in list(self._batches):
+            self._flush(batch_key)
+        if self._in_flight:
+            await asyncio.wait(self._in_flight)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._parse_pool.shutdown)
+        self._analysis_pool.shutdown()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Starts the JSON lines socket server. Returns: the asyncio Server."""
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    async def _handle_client(self, reader, writer):
+        pending = set()
+        # The next line is only read while fewer than connection_pending requests of
+        # this connection are unanswered, so a client that sends faster than it is
+        # served waits on its socket instead of piling up tasks
+        free = asyncio.Semaphore(self.connection_pending)
+        try:
+            while True:
+                await free.acquire()
+                line = await reader.readline()
+                if not line:
+                    break
+                # Requests of one connection run concurrently; responses carry the request id
+                task = asyncio.ensure_future(self._answer(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                task.add_done_callback(lambda _: free.release())
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    async def _answer(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            response = await self.parse(request['grammar'], request['input'], request.get('recover', False))
+            response = dict(response, id=request_id)
+        except Exception as e:
+            response = {'id': request_id, 'error': str(e)}
+        writer.write(json.dumps(response).encode('utf-8') + b'\n')
+        await writer.drain()
+
+
+class ServiceClient:
+    """Client for ParseService.serve; many requests can be in flight on one connection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.waiting = {}
+        self._reading = asyncio.ensure_future(self._read_responses())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=DEFAULT_PORT):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def parse(self, grammar_text, tokens, recover=False):
+        """Same result as ParseService.parse; a bad request raises RuntimeError."""
+        if not isinstance(tokens, str):
+            tokens = " ".join(tokens)
+        self.next_id += 1
+        request_id = self.next_id
+        future = self.waiting[request_id] = asyncio.get_running_loop().create_future()
+        request = {'id': request_id, 'grammar': grammar_text, 'input': tokens, 'recover': recover}
+        self.writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        await self.writer.drain()
+        response = await future
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        del response['id']
+        return response
+
+    async def _read_responses(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response['id'], None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("connection closed by the service"))
+        self.waiting.clear()
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self._reading
+
+
+def _deliver(done, futures):
+    error = done.exception()
+    for i, future in enumerate(futures):
+        if future.done():
+            continue  # the caller gave up (cancelled)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(done.result()[i])
+
+
+def _init_worker(max_grammars):
+    global _worker_parsers, _worker_max_grammars
+    _worker_parsers = OrderedDict()
+    _worker_max_grammars = max_grammars
+
+
+def _parse_batch(key, payload, inputs, recover):
+    """Returns: the results, or None when this worker lacks the grammar and payload is None."""
+    parser = _worker_parsers.get(key)
+    if parser is not None:
+        _worker_parsers.move_to_end(key)
+    elif payload is None:
+        return None
+    else:
+        parser = _worker_parsers[key] = pickle.loads(payload)
+        if len(_worker_parsers) > _worker_max_grammars:
+            _worker_parsers.popitem(last=False)
+    return _parse_with(parser, inputs, recover)
+
+
+def _parse_with(parser, inputs, recover):
+    results = []
+    for tokens in inputs:
+        if recover:
+            _, errors, _ = parser.parse_with_recovery(tokens, TRACE_OFF, False)
+            results.append({
+                'accepted': not errors,
+                'position': errors[0].position if errors else None,
+                'errors': [str(e) for e in errors],
+            })
+        else:
+            _, success, _, pointer = parser._parse(tokens, TRACE_OFF, False)
+            results.append({'accepted': success, 'position': None if success else pointer})
+    return results
+
+
+async def _main(args):
+    service = ParseService(args.workers, None if args.no_disk_cache else DEFAULT_CACHE_DIR,
+                           max_pending=args.max_pending, batch_size=args.batch_size,
+                           connection_pending=args.connection_pending)
+    server = await service.serve(args.host, args.port)
+    print(f"Listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve LL(1) parses over a local socket.")
+    arg_parser.add_argument("--host", default='127.0.0.1')
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument("--workers", type=int, default=None, help="parse processes (0: in-process)")
+    arg_parser.add_argument("--max-pending", type=int, default=10000, help="requests in flight before callers wait")
+    arg_parser.add_argument("--batch-size", type=int, default=64)
+    arg_parser.add_argument("--connection-pending", type=int, default=256,
+                            help="unanswered requests per connection before it stops reading")
+    arg_parser.add_argument("--no-disk-cache", action="store_true")
+    asyncio.run(_main(arg_parser.parse_args()))
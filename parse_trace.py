@@ -0,0 +1,159 @@
+from array import array
+
+# Trace modes accepted by LL1ParserLogic.parse_string
+TRACE_OFF = 'off'
+TRACE_COMPACT = 'compact'
+TRACE_FULL = 'full'
+TRACE_MODES = (TRACE_OFF, TRACE_COMPACT, TRACE_FULL)
+
+# Action codes. A step that expands a non-terminal stores its production id (>= 0),
+# every other kind of step stores one of these negative codes instead.
+MATCH = -1
+ACCEPT = -2
+ERROR_MISMATCH = -3
+ERROR_NO_RULE = -4
+ERROR_UNKNOWN = -5
+# Panic-mode recovery steps (LL1ParserLogic.parse_with_recovery)
+RECOVER_SKIP = -6
+RECOVER_POP = -7
+
+# CompactTrace keeps a copy of the stack every CHECKPOINT_INTERVAL steps it replays,
+# so reading a page deep into a long trace does not replay it from the start
+CHECKPOINT_INTERVAL = 4096
+
+ERROR_TEXT = {
+    ERROR_MISMATCH: "Error: Mismatch",
+    ERROR_NO_RULE: "Error: No Rule",
+    ERROR_UNKNOWN: "Error: Unknown Symbol",
+}
+
+
+def action_text(code, productions, token):
+    """Converts an action code back to the text shown in the simulation table."""
+    if code >= 0:
+        head, body = productions[code]
+        return f"{head} -> {' '.join(body)}"
+    if code == MATCH:
+        return f"Match {token}"
+    if code == ACCEPT:
+        return "Accept"
+    if code == RECOVER_SKIP:
+        return f"Recover: Skip {token}"
+    if code == RECOVER_POP:
+        return "Recover: Pop"
+    return ERROR_TEXT[code]
+
+
+class ParseError:
+    """
+    One syntax error found by a recovering parse.
+    position is the index of the offending token, code one of the ERROR_* codes and
+    expected the terminals that would have been accepted there.
+    """
+    __slots__ = ('position', 'token', 'code', 'expected')
+
+    def __init__(self, position, token, code, expected):
+        self.position = position
+        self.token = token
+        self.code = code
+        self.expected = expected
+
+    def __str__(self):
+        expected = ", ".join(self.expected) or "nothing"
+        return f"token {self.position} ({self.token}): {ERROR_TEXT[self.code]}, expected {expected}"
+
+    def __repr__(self):
+        return f"ParseError({self.position}, {self.token!r}, {ERROR_TEXT[self.code]!r})"
+
+
+class CompactTrace:
+    """
+    Trace that keeps one (action, stack depth, input pointer) record per step.
+    The 'stack' / 'input' strings of a step are only built when the step is read,
+    by replaying the recorded actions, so recording stays O(1) per step.
+    Reading a step gives the same dict as the full trace.
+    """
+
+    def __init__(self, productions, start_symbol, tokens):
+        self.productions = productions
+        self.start_symbol = start_symbol
+        self.tokens = tokens
+        self.records = array('l')
+        self._checkpoints = [('$', start_symbol)]
+
+    def append(self, action, depth, pointer):
+        records = self.records
+        records.append(action)
+        records.append(depth)
+        records.append(pointer)
+
+    def __len__(self):
+        return len(self.records) // 3
+
+    def __iter__(self):
+        stack = ['$', self.start_symbol]
+        records = self.records
+        for i in range(0, len(records), 3):
+            action = records[i]
+            yield self._step(stack, action, records[i + 2])
+            self._apply(stack, action)
+
+    def __getitem__(self, index):
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("trace index out of range")
+        return self.steps(index, index + 1)[0]
+
+    def steps(self, start, stop, input_limit=None):
+        """
+        Returns: the steps start..stop-1 as dicts (e.g. one page of a table view).
+        The stack is replayed from the nearest checkpoint before start.
+        input_limit shortens the 'input' column to that many tokens and '...'.
+        """
+        stop = min(stop, len(self))
+        if start >= stop:
+            return []
+
+        checkpoints = self._checkpoints
+        interval = CHECKPOINT_INTERVAL
+        nearest = min(start // interval, len(checkpoints) - 1)
+        stack = list(checkpoints[nearest])
+        records = self.records
+        result = []
+        for index in range(nearest * interval, stop):
+            if index % interval == 0 and index // interval == len(checkpoints):
+                checkpoints.append(tuple(stack))
+            i = index * 3
+            if index >= start:
+                result.append(self._step(stack, records[i], records[i + 2], input_limit))
+            self._apply(stack, records[i])
+        return result
+
+    def raw(self):
+        """Yields the raw (action, depth, pointer) records without building any strings."""
+        records = self.records
+        for i in range(0, len(records), 3):
+            yield records[i], records[i + 1], records[i + 2]
+
+    def _step(self, stack, action, pointer, input_limit=None):
+        tokens = self.tokens
+        if input_limit is not None and len(tokens) - pointer > input_limit:
+            remaining = " ".join(tokens[pointer:pointer + input_limit]) + " ..."
+        else:
+            remaining = " ".join(tokens[pointer:])
+        return {
+            "stack": " ".join(stack),
+            "input": remaining,
+            "action": action_text(action, self.productions, self.tokens[pointer]),
+        }
+
+    def _apply(self, stack, action):
+        if action >= 0:
+            stack.pop()
+            body = self.productions[action][1]
+            if body != ['ε']:
+                stack.extend(reversed(body))
+        elif action == MATCH or action == RECOVER_POP:
+            stack.pop()
@@ -0,0 +1,14 @@
+class TreeNode:
+    """
+    Parse tree node.
+    Uses __slots__ so a node carries no __dict__; leaves share an empty tuple
+    instead of owning a list. Layout data lives in TreeDrawer's TreeLayout.
+    """
+    __slots__ = ('label', 'children')
+
+    def __init__(self, label, children=()):
+        self.label = label
+        self.children = children
+
+    def __repr__(self):
+        return f"TreeNode({self.label!r}, {len(self.children)} children)"
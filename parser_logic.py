@@ -1,8 +1,30 @@
+import copy
 from collections import defaultdict
 
+import batch_parser
+import bitset_analysis
+import error_recovery
+import incremental_analysis
+import lookahead
+from grammar_utils import close_sets, nullable_symbols
+from conflicts import LL1Conflict, GrammarConflictError, FIRST, FOLLOW
+from compiled_table import CompiledTable, NO_RULE, UNKNOWN_TOKEN, LOOKAHEAD
+from parse_tree import TreeNode
+from parser_stats import PROGRESS_TOKENS
+from parse_trace import (TRACE_MODES, TRACE_OFF, TRACE_FULL, TRACE_COMPACT, CompactTrace, action_text,
+                         MATCH, ACCEPT, ERROR_MISMATCH, ERROR_NO_RULE)
+
 
 class LL1ParserLogic:
-    def __init__(self, grammar, start_symbol, non_terminals):
+    def __init__(self, grammar, start_symbol, non_terminals, backend='sets', symbols=None):
+        """
+        backend picks how FIRST / FOLLOW are computed and stored: 'sets' (sets of
+        strings), 'bits' (Python int bitsets) or 'numpy' (packed bit matrices), see
+        bitset_analysis.py. first / follow read the same either way.
+        symbols is the SymbolTable the grammar was read with, if any; the compiled
+        table then numbers the symbols by its ids.
+        """
+        bitset_analysis.check_backend(backend)
         self.grammar = grammar
         self.start_symbol = start_symbol
         self.non_terminals = non_terminals
@@ -10,6 +32,32 @@ class LL1ParserLogic:
         self.first = defaultdict(set)
         self.follow = defaultdict(set)
         self.parsing_table = defaultdict(dict)
+        self.production_ids = defaultdict(dict)
+        # (non-terminal, terminal) -> LL1Conflict, collected while the table is filled
+        self.conflicts = {}
+        self.compiled = None
+        self.nullable = None
+        # Optional ParserStats; None keeps instrumentation off
+        self.stats = None
+        # Reverse indexes for incremental edits, built on the first edit
+        self._index = None
+        self.backend = backend
+        self.symbols = symbols
+        # Bitset backends: FIRST / FOLLOW as bit vectors over bit_terminals, see bitset_analysis.py
+        self.bit_terminals = None
+        self.terminal_bits = None
+        self.first_bits = None
+        self.follow_bits = None
+        # Lookahead limit of build_table and the LL(k) tries it made, see lookahead.py
+        self.max_k = 1
+        self.lookahead = {}
+        # Set by GrammarCache, which hands the same instance to every caller of the
+        # grammar: it is read-only then, and edits have to go to a copy()
+        self.shared = False
+
+        # Number the productions so traces can refer to them by id.
+        # Ids stay stable across incremental edits: a removed production leaves None behind.
+        self.productions = [(head, body) for head, bodies in self.grammar.items() for body in bodies]
 
         # Identify Terminals
         for head, bodies in self.grammar.items():
@@ -19,184 +67,452 @@ class LL1ParserLogic:
                         self.terminals.add(symbol)
         self.terminals.add('$')
 
+    def __getstate__(self):
+        # Stats belong to the process that collected them (cache files, pool workers)
+        state = self.__dict__.copy()
+        state['stats'] = None
+        state['shared'] = False
+        return state
+
+    def copy(self):
+        """Returns: an independent, editable copy (not shared, no stats attached)."""
+        return copy.deepcopy(self)
+
     def compute_first(self):
+        """
+        Worklist computation of FIRST.
+        Nullable symbols are found first (grammar_utils.nullable_symbols), then FIRST
+        is pushed along the edges X -> A (for every X inside the nullable prefix of a
+        body of A). The edges are condensed into strongly
+        connected components, visited once in topological order, so deep nullable
+        chains cost one union per edge.
+        """
+        if self.backend != bitset_analysis.SETS:
+            return bitset_analysis.compute_first(self)
+
+        stats = self.stats
+        if stats is not None:
+            started = stats.start()
+
+        # Start from fresh sets: the closure would carry the ε of an earlier run
+        # into every head it reaches
+        first = self.first = defaultdict(set)
         for t in self.terminals:
-            self.first[t].add(t)
-
-        changed = True
-        while changed:
-            changed = False
-            for head, bodies in self.grammar.items():
-                for body in bodies:
-                    if body == ['ε']:
-                        if 'ε' not in self.first[head]:
-                            self.first[head].add('ε')
-                            changed = True
-                        continue
-
-                    # Compute First(Body)
-                    has_epsilon = True
-                    for symbol in body:
-                        fs = self.first[symbol]
-                        to_add = fs - {'ε'}
-                        if not to_add.issubset(self.first[head]):
-                            self.first[head].update(to_add)
-                            changed = True
-                        if 'ε' not in fs:
-                            has_epsilon = False
-                            break
-
-                    if has_epsilon:
-                        if 'ε' not in self.first[head]:
-                            self.first[head].add('ε')
-                            changed = True
+            first[t].add(t)
+
+        bodies_of = [(head, [] if body == ['ε'] else body)
+                     for head, body in filter(None, self.productions)]
+
+        # 1. Nullable symbols
+        for head, _ in bodies_of:
+            first[head]  # every head gets an entry, even if it stays empty
+        nullable = nullable_symbols(bodies_of)
+        self.nullable = nullable
+
+        # 2. FIRST edges: FIRST(X) - {ε} flows into FIRST(A) for X in the nullable prefix
+        successors = defaultdict(set)
+        for head, body in bodies_of:
+            for symbol in body:
+                if symbol != head:
+                    successors[symbol].add(head)
+                if symbol not in nullable:
+                    break
+
+        # 3. Propagate over the strongly connected components of the edges: the members
+        # of a component share one FIRST and every edge is crossed once
+        visits = close_sets(list(successors), successors, first)
+
+        for symbol in nullable:
+            first[symbol].add('ε')
+
+        if stats is not None:
+            stats.first_iterations += visits
+            stats.stop('compute_first', started)
 
     def compute_follow(self):
-        self.follow[self.start_symbol].add('$')
-        changed = True
-        while changed:
-            changed = False
-            for head, bodies in self.grammar.items():
-                for body in bodies:
-                    if body == ['ε']: continue
-
-                    for i, symbol in enumerate(body):
-                        if symbol in self.non_terminals:
-                            suffix = body[i + 1:]
-                            # Calculate First(suffix)
-                            suffix_first = set()
-                            suffix_has_epsilon = True
-                            if not suffix:
-                                suffix_has_epsilon = True
-                            else:
-                                for s in suffix:
-                                    fs = self.first[s]
-                                    suffix_first.update(fs - {'ε'})
-                                    if 'ε' not in fs:
-                                        suffix_has_epsilon = False
-                                        break
-
-                            if not suffix_first.issubset(self.follow[symbol]):
-                                self.follow[symbol].update(suffix_first)
-                                changed = True
-
-                            if suffix_has_epsilon:
-                                if not self.follow[head].issubset(self.follow[symbol]):
-                                    self.follow[symbol].update(self.follow[head])
-                                    changed = True
-
-    def build_table(self):
-        self.parsing_table = defaultdict(dict)
-        for head, bodies in self.grammar.items():
-            for body in bodies:
-                # First(Body)
-                first_body = set()
-                body_has_epsilon = True
-                if body == ['ε']:
-                    first_body.add('ε')
+        """
+        Worklist computation of FOLLOW.
+        FIRST of every suffix is computed once, right to left per body, and added
+        directly; afterwards only the edges FOLLOW(A) -> FOLLOW(B) for A -> ... B
+        (with a nullable tail) are propagated. Like in compute_first they are condensed
+        into strongly connected components and visited once in topological order, so
+        the cost does not depend on the order of the grammar lines.
+        """
+        if self.backend != bitset_analysis.SETS:
+            return bitset_analysis.compute_follow(self)
+
+        stats = self.stats
+        if stats is not None:
+            started = stats.start()
+
+        first = self.first
+        follow = self.follow = defaultdict(set)
+        non_terminals = self.non_terminals
+        nullable = self.nullable
+        if nullable is None:
+            nullable = {s for s, fs in first.items() if 'ε' in fs}
+
+        follow[self.start_symbol].add('$')
+        successors = defaultdict(set)
+        for head, body in filter(None, self.productions):
+            if body == ['ε']: continue
+
+            suffix_first = set()
+            suffix_nullable = True
+            for symbol in reversed(body):
+                if symbol in non_terminals:
+                    follow[symbol].update(suffix_first)
+                    if suffix_nullable and symbol != head:
+                        successors[head].add(symbol)
+
+                # Extend First(suffix) with this symbol
+                fs = first[symbol]
+                if symbol in nullable:
+                    suffix_first.update(fs)
+                    suffix_first.discard('ε')
                 else:
-                    for s in body:
-                        fs = self.first[s]
-                        first_body.update(fs - {'ε'})
-                        if 'ε' not in fs:
-                            body_has_epsilon = False
-                            break
-                    if body_has_epsilon:
-                        first_body.add('ε')
-
-                # Rule 1
-                for term in first_body:
-                    if term != 'ε':
-                        self.parsing_table[head][term] = body
-
-                # Rule 2
-                if 'ε' in first_body:
-                    for term in self.follow[head]:
-                        self.parsing_table[head][term] = body
-
-    def parse_string(self, input_string):
+                    suffix_first = fs - {'ε'}
+                    suffix_nullable = False
+
+        # FOLLOW(A) -> FOLLOW(B) edges, closed over their strongly connected components
+        visits = close_sets(list(successors), successors, follow)
+
+        if stats is not None:
+            stats.follow_iterations += visits
+            stats.stop('compute_follow', started)
+
+    def build_table(self, strict=False, max_k=None):
+        """
+        Fills the parsing table. Cells claimed by more than one production are
+        recorded in self.conflicts while filling (the last production still wins).
+        With max_k > 1 the conflicted cells that up to max_k tokens can decide get a
+        lookahead trie instead and are no longer conflicts (self.lookahead).
+        With strict=True a grammar left with conflicts raises GrammarConflictError
+        and the parser keeps the table (and compiled table) it had before the call.
+        max_k defaults to the value of the previous call (1 at first).
+        """
+        stats = self.stats
+        if stats is not None:
+            started = stats.start()
+
+        previous = (self.parsing_table, self.production_ids, self.conflicts, self.lookahead, self.max_k)
+        try:
+            self.parsing_table = defaultdict(dict)
+            self.production_ids = defaultdict(dict)
+            self.conflicts = {}
+            for pid, production in enumerate(self.productions):
+                if production is not None:
+                    self._add_table_entries(pid, *production)
+
+            if max_k is not None:
+                self.max_k = max_k
+            self.lookahead = {}
+            if self.max_k > 1 and self.conflicts:
+                self.lookahead = lookahead.resolve_conflicts(self, self.max_k)
+
+            if strict and self.conflicts:
+                conflicts = self.conflicts
+                (self.parsing_table, self.production_ids, self.conflicts,
+                 self.lookahead, self.max_k) = previous
+                raise GrammarConflictError(conflicts.values())
+
+            self.compile_table()
+        finally:
+            if stats is not None:
+                stats.stop('build_table', started)
+
+    def first_of(self, body):
+        """FIRST of a sequence of symbols; contains 'ε' when the whole sequence is nullable."""
+        first_body = set()
+        if body == ['ε']:
+            first_body.add('ε')
+            return first_body
+        for s in body:
+            fs = self.first[s]
+            first_body.update(fs)
+            if 'ε' not in fs:
+                first_body.discard('ε')
+                return first_body
+        first_body.add('ε')
+        return first_body
+
+    def _add_table_entries(self, pid, head, body):
+        if self.follow_bits is not None:
+            # Bitset backends: the cells come straight from the bit vectors
+            first_body, nullable = bitset_analysis.first_of_bits(self, body)
+            self._fill_cells(pid, head, body, bitset_analysis.terminals_of(self, first_body), FIRST)
+            if nullable:
+                follow = bitset_analysis.terminals_of(self, self.follow_bits.get(head, 0))
+                self._fill_cells(pid, head, body, follow, FOLLOW)
+            return
+
+        first_body = self.first_of(body)
+        # Rule 1
+        self._fill_cells(pid, head, body, (term for term in first_body if term != 'ε'), FIRST)
+        # Rule 2
+        if 'ε' in first_body:
+            self._fill_cells(pid, head, body, self.follow[head], FOLLOW)
+
+    def _fill_cells(self, pid, head, body, terms, cause):
+        row = self.production_ids[head]
+        for term in terms:
+            if term in row and row[term] != pid:
+                self._record_conflict(head, term, row[term], body, cause)
+            self.parsing_table[head][term] = body
+            row[term] = pid
+
+    def _record_conflict(self, head, term, old_pid, body, cause):
+        conflict = self.conflicts.get((head, term))
+        if conflict is None:
+            conflict = self.conflicts[(head, term)] = LL1Conflict(head, term)
+            # Only worked out for cells that clash, so the normal fill path stays cheap
+            old_body = self.productions[old_pid][1]
+            conflict.add(old_body, FIRST if term in self.first_of(old_body) else FOLLOW)
+        conflict.add(body, cause)
+
+    def _clear_row(self, head):
+        """Forgets the table row of head (and its conflicts) before it is refilled."""
+        self.parsing_table.pop(head, None)
+        self.production_ids.pop(head, None)
+        for key in [key for key in self.conflicts if key[0] == head]:
+            del self.conflicts[key]
+
+    def compile_table(self):
+        """Builds the integer-indexed table used by parse_string from production_ids."""
+        self.compiled = CompiledTable(self.productions, self.start_symbol, self.terminals,
+                                      self.non_terminals, self.production_ids, self.lookahead, self.symbols)
+        return self.compiled
+
+    def add_production(self, head, body):
+        """
+        Adds head -> body and updates only the affected FIRST/FOLLOW entries and table rows.
+        body is a list of symbols or a string; an empty body means ε.
+        Returns: the set of non-terminals whose table row was rebuilt.
+        """
+        return incremental_analysis.apply_edit(self, head, None, self._normalize_body(body))
+
+    def remove_production(self, head, body):
+        """Removes head -> body, see add_production."""
+        pid = self._find_production(head, self._normalize_body(body))
+        return incremental_analysis.apply_edit(self, head, pid, None)
+
+    def replace_production(self, head, old_body, new_body):
+        """Replaces head -> old_body by head -> new_body (same production id), see add_production."""
+        pid = self._find_production(head, self._normalize_body(old_body))
+        return incremental_analysis.apply_edit(self, head, pid, self._normalize_body(new_body))
+
+    def _normalize_body(self, body):
+        if isinstance(body, str):
+            body = body.split()
+        return list(body) or ['ε']
+
+    def _find_production(self, head, body):
+        if self._index is None:
+            self._index = incremental_analysis.GrammarIndex(self.productions)
+        for pid in self._index.head_pids.get(head, ()):
+            if self.productions[pid][1] == body:
+                return pid
+        raise ValueError(f"No production {head} -> {' '.join(body)}")
+
+    def parse_string(self, input_string, trace_mode=TRACE_FULL, build_tree=True):
         """
         Returns: (trace, success, root_node)
-        Trace is a list of steps.
-        Root_node is a dict structure for the tree: {'id': unique_id, 'label': 'E', 'children': []}
+        trace_mode chooses how the steps are recorded:
+          'full'    - list of {'stack', 'input', 'action'} dicts
+          'compact' - CompactTrace, one (action, depth, pointer) record per step;
+                      the strings are only built when a step is read
+          'off'     - nothing is recorded and trace is None
+        With build_tree=False no parse tree is built (recognition only) and root_node is None.
         """
-        tokens = input_string.strip().split()
-        tokens.append('$')
+        return self.parse_tokens(input_string.strip().split(), trace_mode, build_tree)
 
-        # We need a custom stack that tracks Tree Nodes
-        # Node structure: [label, children_list]
-        root_node = {'label': self.start_symbol, 'children': []}
+    def recognize(self, tokens):
+        """Accept/reject only: no trace and no tree. tokens is a string or an iterable of tokens."""
+        if isinstance(tokens, str):
+            tokens = tokens.split()
+        return self._parse(tokens, TRACE_OFF, False)[1]
 
-        # Stack contains tuples: (symbol, parent_node_reference)
-        # However, parent_node needs to know WHERE to add the child.
-        # A simpler way: The stack contains Node objects.
+    def parse_tokens(self, tokens, trace_mode=TRACE_OFF, build_tree=False):
+        """
+        Parses any iterable of token strings (a list, a generator, a lazy lexer...).
+        The end marker '$' is added automatically when the iterable runs out.
+        Returns: (trace, success, root_node), see parse_string.
+
+        With the defaults (trace_mode='off', build_tree=False) tokens are pulled one at
+        a time and only the parser stack and a single lookahead token are held in
+        memory; pass build_tree=True for the parse tree.
+        A traced parse needs the input text for its 'input' column, so it reads the
+        whole iterable up front.
+        """
+        trace, success, root_obj, _ = self._parse(tokens, trace_mode, build_tree)
+        return trace, success, root_obj
 
-        class TreeNode:
-            def __init__(self, label):
-                self.label = label
-                self.children = []
+    def parse_with_recovery(self, tokens, trace_mode=TRACE_OFF, build_tree=True):
+        """
+        Parses like parse_tokens but does not stop at the first error: panic-mode
+        recovery skips input tokens or pops the stack, using the FOLLOW sets as
+        synchronizing tokens, so one pass reports every error.
+        tokens is a string or an iterable of tokens.
+        Returns: (trace, errors, root_node) where errors is a list of ParseError,
+        empty when the input is accepted.
+        """
+        if isinstance(tokens, str):
+            tokens = tokens.split()
+        return error_recovery.parse_with_recovery(self, tokens, trace_mode, build_tree)
 
-        root_obj = TreeNode(self.start_symbol)
-        stack = [TreeNode('$'), root_obj]
+    def parse_many(self, inputs, workers=None, chunk_size=None, trees=False, positions=False):
+        """
+        Parses many inputs (strings or token lists) against this table, spread over
+        a pool of worker processes that receive the built parser once.
+        Returns one result per input, in order: the success flag, or when trees or
+        positions are requested a tuple (success, error_position, tree).
+        trees='flat' gives each tree as the flat (label table, label ids, child counts)
+        arrays the workers send, without rebuilding TreeNodes (see parse_export).
+        """
+        return batch_parser.parse_many(self, inputs, workers, chunk_size, trees, positions)
 
-        trace = []
+    def _parse(self, tokens, trace_mode, build_tree=True, sink=None):
+        """
+        Driver behind parse_tokens; also returns the token position it stopped at.
+        In compact mode sink, when given, is called with the token list and returns the
+        object that records the steps instead of a CompactTrace (see parse_export).
+        """
+        if trace_mode not in TRACE_MODES:
+            raise ValueError(f"Unknown trace mode: {trace_mode}")
+        if self.compiled is None:
+            raise ValueError("build_table() must run before parsing")
+
+        stats = self.stats
+        if stats is not None:
+            started = stats.start()
+        lookups = pushes = max_depth = 0
+
+        full = trace_mode == TRACE_FULL
+        if full:
+            tokens = list(tokens)
+            tokens.append('$')
+            trace = []
+        elif trace_mode == TRACE_COMPACT:
+            tokens = list(tokens)
+            tokens.append('$')
+            if sink is None:
+                trace = CompactTrace(self.productions, self.start_symbol, tokens)
+            else:
+                trace = sink(tokens)
+        else:
+            trace = None
+
+        compiled = self.compiled
+        labels = compiled.labels
+        n_terms = compiled.n_terms
+        table = compiled.table
+        bodies = compiled.bodies
+        term_ids = compiled.term_ids
+
+        # Symbol ids and tree nodes are kept on two parallel stacks
+        stack = [compiled.end_id, compiled.start_id]
+        if build_tree:
+            root_obj = TreeNode(self.start_symbol)
+            nodes = [TreeNode('$'), root_obj]
+        else:
+            root_obj = nodes = None
+
+        # Cells with a lookahead trie read tokens ahead, which the driver then gets first
+        tries = compiled.lookahead
+        if tries:
+            token_iter, raw_tokens, ahead = lookahead.token_reader(tokens)
+        else:
+            token_iter = iter(tokens)
+        token = next(token_iter, '$')
+        lookahead_id = term_ids.get(token, UNKNOWN_TOKEN)
+
+        productions = self.productions
         pointer = 0
         success = False
 
-        while len(stack) > 0:
-            top_node = stack[-1]
-            top_symbol = top_node.label
-            current_input = tokens[pointer]
+        while stack:
+            top = stack[-1]
 
-            step_data = {
-                "stack": " ".join([n.label for n in stack]),
-                "input": " ".join(tokens[pointer:]),
-                "action": ""
-            }
+            if full:
+                step_stack = " ".join([labels[s] for s in stack])
+            elif trace is not None:
+                depth = len(stack)
 
-            if top_symbol == current_input:
-                step_data["action"] = f"Match {current_input}"
-                stack.pop()
-                pointer += 1
-                if top_symbol == '$':
-                    step_data["action"] = "Accept"
-                    success = True
-                    trace.append(step_data)
-                    break
-            elif top_symbol in self.terminals:
-                step_data["action"] = "Error: Mismatch"
-                trace.append(step_data)
-                return trace, False, root_obj
-            elif top_symbol in self.non_terminals:
-                entry = self.parsing_table.get(top_symbol, {}).get(current_input)
-                if entry is not None:
-                    step_data["action"] = f"{top_symbol} -> {' '.join(entry)}"
+            if top < n_terms:
+                if top == lookahead_id:
+                    action = MATCH
+                    stack.pop()
+                    if nodes is not None:
+                        nodes.pop()
+                    if top == 0:
+                        action = ACCEPT
+                        success = True
+                else:
+                    action = ERROR_MISMATCH
+            else:
+                cell = (top - n_terms) * n_terms + lookahead_id
+                pid = table[cell] if lookahead_id >= 0 else NO_RULE
+                if pid == LOOKAHEAD:
+                    pid = lookahead.predict(tries[cell], raw_tokens, ahead, term_ids)
+                if pid != NO_RULE:
+                    action = pid
                     stack.pop()  # Pop the Non-Terminal
+                    # Push to stack in reverse (epsilon pushes nothing)
+                    stack.extend(compiled.push[pid])
+
+                    if stats is not None:
+                        lookups += 1
+                        pushes += len(compiled.push[pid])
+                        if len(stack) > max_depth:
+                            max_depth = len(stack)
 
-                    # Create children nodes
-                    new_nodes = []
-                    if entry == ['ε']:
-                        child = TreeNode('ε')
-                        top_node.children.append(child)
-                        # Do not push epsilon to stack
-                    else:
-                        for symbol in entry:
-                            child = TreeNode(symbol)
-                            new_nodes.append(child)
-                            top_node.children.append(child)
-
-                        # Push to stack in reverse
-                        for child in reversed(new_nodes):
-                            stack.append(child)
+                    if nodes is not None:
+                        top_node = nodes.pop()
+                        body = bodies[pid]
+                        if not body:
+                            top_node.children = [TreeNode('ε')]
+                        else:
+                            children = [TreeNode(labels[s]) for s in body]
+                            top_node.children = children
+                            nodes.extend(reversed(children))
                 else:
-                    step_data["action"] = "Error: No Rule"
-                    trace.append(step_data)
-                    return trace, False, root_obj
-            else:
-                step_data["action"] = "Error: Unknown Symbol"
-                trace.append(step_data)
-                return trace, False, root_obj
+                    action = ERROR_NO_RULE
+                    lookups += 1
+
+            if full:
+                trace.append({
+                    "stack": step_stack,
+                    "input": " ".join(tokens[pointer:]),
+                    "action": action_text(action, productions, token)
+                })
+            elif trace is not None:
+                trace.append(action, depth, pointer)
+
+            if action == MATCH:
+                # Advance to the next lookahead token
+                pointer += 1
+                token = next(token_iter, '$')
+                lookahead_id = term_ids.get(token, UNKNOWN_TOKEN)
+                if stats is not None and pointer % PROGRESS_TOKENS == 0:
+                    stats.progress('parse', pointer)
+            elif action == ACCEPT:
+                break
+            elif action < ACCEPT:
+                break
+
+        if stats is not None:
+            # Every step is either a table lookup or a match (one per consumed token)
+            stats.parses += 1
+            stats.parse_steps += lookups + pointer + (1 if success else 0)
+            stats.table_lookups += lookups
+            stats.stack_pushes += pushes
+            stats.max_stack_depth = max(stats.max_stack_depth, max_depth)
+            stats.stop('parse', started)
+
+        return trace, success, root_obj, pointer
 
-            trace.append(step_data)
 
-        return trace, success, root_obj
\ No newline at end of file
+def read_tokens(stream):
+    """Lazily yields whitespace separated tokens from a text stream (e.g. an open file)."""
+    for line in stream:
+        yield from line.split()
@@ -0,0 +1,56 @@
+import time
+
+# A parse reports progress every PROGRESS_TOKENS consumed tokens
+PROGRESS_TOKENS = 4096
+
+
+class ParserStats:
+    """
+    Counters and stage timings collected by LL1ParserLogic when assigned to its
+    `stats` attribute (it is None by default, which turns all collection off).
+
+    Counters accumulate over every stage / parse run until reset() is called.
+    If a callback is given it is called as callback(stage, seconds, stats) each
+    time a stage (compute_first, compute_follow, build_table, parse) finishes.
+    If progress is given it is called as progress(stage, done) from inside a parse
+    every PROGRESS_TOKENS tokens (done is the token count so far); raising from it
+    aborts the parse.
+    """
+
+    COUNTERS = (
+        'first_iterations', 'follow_iterations',
+        'parses', 'parse_steps', 'table_lookups', 'stack_pushes', 'max_stack_depth',
+    )
+
+    def __init__(self, callback=None, progress=None):
+        self.callback = callback
+        self.progress_callback = progress
+        self.reset()
+
+    def reset(self):
+        self.first_iterations = 0      # worklist visits while computing nullable/FIRST
+        self.follow_iterations = 0     # worklist visits while computing FOLLOW
+        self.parses = 0
+        self.parse_steps = 0
+        self.table_lookups = 0
+        self.stack_pushes = 0
+        self.max_stack_depth = 0
+        self.timings = {}
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, stage, started):
+        seconds = time.perf_counter() - started
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        if self.callback is not None:
+            self.callback(stage, seconds, self)
+
+    def progress(self, stage, done):
+        if self.progress_callback is not None:
+            self.progress_callback(stage, done)
+
+    def as_dict(self):
+        result = {name: getattr(self, name) for name in self.COUNTERS}
+        result.update({f"{stage}_seconds": seconds for stage, seconds in self.timings.items()})
+        return result
@@ -0,0 +1,70 @@
+"""Grammars and helpers shared by the tests."""
+import random
+
+from parser_logic import LL1ParserLogic
+
+EXPR = "E -> E + T | T\nT -> T * F | F\nF -> ( E ) | id"
+
+
+def random_body(rng, non_terminals, terminals):
+    if rng.random() < 0.2:
+        return ['ε']
+    return [rng.choice(non_terminals + terminals) for _ in range(rng.randint(1, 4))]
+
+
+def random_grammar(rng, n_non_terminals, terminals):
+    non_terminals = [f"N{i}" for i in range(n_non_terminals)]
+    grammar = {head: [random_body(rng, non_terminals, terminals) for _ in range(rng.randint(1, 3))]
+               for head in non_terminals}
+    return grammar, non_terminals
+
+
+def random_grammars(count, n_non_terminals=6, terminals=('a', 'b', 'c')):
+    """Yields (seed, grammar, non_terminals) for count seeded random grammars."""
+    for seed in range(count):
+        yield (seed, *random_grammar(random.Random(seed), n_non_terminals, list(terminals)))
+
+
+def analyzed(grammar, start, non_terminals, backend='sets', max_k=1):
+    parser = LL1ParserLogic(grammar, start, set(non_terminals), backend)
+    parser.compute_first()
+    parser.compute_follow()
+    parser.build_table(max_k=max_k)
+    return parser
+
+
+def tree_tuple(node):
+    return node.label, [tree_tuple(child) for child in node.children]
+
+
+def earley(grammar, start, tokens):
+    """Returns: whether start derives tokens (a plain Earley recognizer, ε bodies allowed)."""
+    bodies = {head: [tuple(s for s in body if s != 'ε') for body in alternatives]
+              for head, alternatives in grammar.items()}
+    sets = [set() for _ in range(len(tokens) + 1)]
+    sets[0].add(('^', (start,), 0, 0))
+    for i, items in enumerate(sets):
+        agenda = list(items)
+        while agenda:
+            head, body, dot, origin = agenda.pop()
+            if dot < len(body):
+                symbol = body[dot]
+                if symbol in bodies:
+                    new = [(symbol, b, 0, i) for b in bodies[symbol]]
+                    # Completed nullable items of this set advance the new prediction too
+                    new += [(head, body, dot + 1, origin) for h, b, d, o in list(items)
+                            if h == symbol and d == len(b) and o == i]
+                    for item in new:
+                        if item not in items:
+                            items.add(item)
+                            agenda.append(item)
+                elif i < len(tokens) and tokens[i] == symbol:
+                    sets[i + 1].add((head, body, dot + 1, origin))
+            else:
+                for h, b, d, o in list(sets[origin]):
+                    if d < len(b) and b[d] == head:
+                        item = (h, b, d + 1, o)
+                        if item not in items:
+                            items.add(item)
+                            agenda.append(item)
+    return ('^', (start,), 1, 0) in sets[-1]
@@ -0,0 +1,43 @@
+import unittest
+
+from batch_parser import FLAT
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR, tree_tuple
+from parse_export import tree_from_arrays
+from parse_trace import TRACE_OFF
+
+
+class ParseManyTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = analyze_grammar(EXPR)
+        self.inputs = ["id + id", "id + * id", "( id ) * id", ")", "", "id id", "( ( id ) )"] * 3
+
+    def expected(self):
+        results = []
+        for text in self.inputs:
+            _, success, root, pointer = self.parser._parse(text.split(), TRACE_OFF, True)
+            results.append((success, None if success else pointer, root))
+        return results
+
+    def test_pool_keeps_input_order_and_positions(self):
+        results = self.parser.parse_many(self.inputs, workers=2, chunk_size=3, trees=True, positions=True)
+        expected = self.expected()
+        self.assertEqual(len(results), len(expected))
+        for text, (success, position, tree), (ok, stop, root) in zip(self.inputs, results, expected):
+            self.assertEqual((success, position), (ok, stop), text)
+            self.assertEqual(tree_tuple(tree), tree_tuple(root), text)
+
+    def test_flags_match_serial_parse(self):
+        flags = [success for success, _, _ in self.expected()]
+        self.assertEqual(self.parser.parse_many(self.inputs, workers=2, chunk_size=2), flags)
+        self.assertEqual(self.parser.parse_many(self.inputs, workers=1), flags)
+
+    def test_flat_trees(self):
+        results = self.parser.parse_many(self.inputs[:3], workers=2, chunk_size=1, trees=FLAT)
+        for (success, _, flat), (ok, _, root) in zip(results, self.expected()):
+            self.assertEqual(success, ok)
+            self.assertEqual(tree_tuple(tree_from_arrays(*flat)), tree_tuple(root))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+import unittest
+
+import benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_main_on_a_tiny_grid(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.json")
+            benchmark.main(["--sizes", "2", "20", "--tokens", "10", "200", "--repeat", "1",
+                            "--max-steps", "2000", "--tree-tokens", "50", "-o", path])
+            with open(path) as f:
+                report = json.load(f)
+
+        results = report["results"]
+        self.assertEqual(sorted({r["family"] for r in results}), sorted(benchmark.FAMILIES))
+        self.assertEqual(len(results), 2 * len(benchmark.FAMILIES))
+        for result in results:
+            self.assertIn("compute_first", result["stages"])
+            short, long = result["parse_string"]
+            self.assertTrue(short["accepted"])
+            self.assertTrue(short["build_tree"])
+            self.assertIn("peak_bytes", short)
+            if "skipped" not in long:
+                self.assertTrue(long["accepted"])
+                self.assertFalse(long["build_tree"])
+
+        # Every id of the expression grammar walks the whole E0 ... E<size> chain
+        expression = next(r for r in results if r["family"] == "expression" and r["size"] == 20)
+        self.assertIn("skipped", expression["parse_string"][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import benchmark
+import bitset_analysis
+import grammar_utils
+from grammar_samples import analyzed, random_grammars
+
+
+def sets_of(parser):
+    first = {s: set(parser.first[s]) for s in parser.non_terminals | parser.terminals}
+    follow = {nt: set(parser.follow[nt]) for nt in parser.non_terminals}
+    return first, follow, dict(parser.production_ids), dict(parser.conflicts)
+
+
+class BackendTest(unittest.TestCase):
+    def assert_backend_matches_sets(self, backend):
+        for seed, grammar, non_terminals in random_grammars(200):
+            expected = sets_of(analyzed(grammar, 'N0', non_terminals))
+            parser = analyzed(grammar, 'N0', non_terminals, backend)
+            first, follow, rows, conflicts = sets_of(parser)
+            self.assertEqual((first, follow, rows), expected[:3], seed)
+            self.assertEqual(conflicts.keys(), expected[3].keys(), seed)
+
+        text = benchmark.nullable_chain_grammar(200)[0]
+        grammar, start, non_terminals = grammar_utils.parse_grammar(text)
+        self.assertEqual(sets_of(analyzed(grammar, start, non_terminals, backend))[:3],
+                         sets_of(analyzed(grammar, start, non_terminals))[:3])
+
+    def test_bits(self):
+        self.assert_backend_matches_sets(bitset_analysis.BITS)
+
+    @unittest.skipIf(bitset_analysis.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.assert_backend_matches_sets(bitset_analysis.NUMPY)
+
+    @unittest.skipIf(bitset_analysis.numpy is None, "NumPy is not installed")
+    def test_numpy_keeps_the_packed_matrix(self):
+        grammar, start, non_terminals = grammar_utils.parse_grammar(benchmark.expression_grammar(20)[0])
+        grammar, non_terminals = grammar_utils.transform_grammar(grammar, non_terminals)
+        parser = analyzed(grammar, start, non_terminals, bitset_analysis.NUMPY)
+        bits = analyzed(grammar, start, non_terminals, bitset_analysis.BITS)
+        for stored, expected in ((parser.first_bits, bits.first_bits), (parser.follow_bits, bits.follow_bits)):
+            self.assertIsInstance(stored, bitset_analysis.PackedBits)
+            self.assertEqual(dict(stored), expected)
+        self.assertTrue(parser.recognize('id op0 ( id op3 id )'))
+
+    def test_missing_numpy_is_reported(self):
+        if bitset_analysis.numpy is not None:
+            self.skipTest("NumPy is installed")
+        with self.assertRaises(ImportError):
+            bitset_analysis.check_backend(bitset_analysis.NUMPY)
+
+
+if __name__ == '__main__':
+    unittest.main()
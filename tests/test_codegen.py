@@ -0,0 +1,53 @@
+import itertools
+import types
+import unittest
+
+import codegen
+import grammar_utils
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR, analyzed, random_grammars
+from parse_trace import TRACE_OFF
+
+
+def generated(parser):
+    module = types.ModuleType('generated_parser')
+    exec(compile(codegen.generate_parser_module(parser), 'generated_parser.py', 'exec'), module.__dict__)
+    return module
+
+
+class CodegenTest(unittest.TestCase):
+    def assert_agrees(self, parser, terminals, max_length, context):
+        module = generated(parser)
+        for length in range(max_length + 1):
+            for tokens in itertools.product(terminals, repeat=length):
+                tokens = list(tokens)
+                _, success, _, position = parser._parse(tokens, TRACE_OFF, False)
+                self.assertEqual(module.recognize(tokens), parser.recognize(tokens), (context, tokens))
+                self.assertEqual(module.parse(iter(tokens)), (success, position), (context, tokens))
+
+    def test_expression_grammar(self):
+        self.assert_agrees(analyze_grammar(EXPR), ['id', '+', '*', '(', ')', 'x'], 4, 'expr')
+
+    def test_random_grammars(self):
+        checked = 0
+        for seed, grammar, non_terminals in random_grammars(200, 4):
+            try:
+                grammar, non_terminals = grammar_utils.transform_grammar(grammar, set(non_terminals))
+            except ValueError:
+                continue
+            parser = analyzed(grammar, 'N0', non_terminals)
+            if parser.conflicts:
+                continue
+            checked += 1
+            self.assert_agrees(parser, ['a', 'b', 'c'], 4, seed)
+        self.assertGreater(checked, 20)
+
+    def test_lookahead_tables_are_refused(self):
+        parser = analyze_grammar("S -> A q | B r\nA -> a a\nB -> a b", max_k=2)
+        self.assertTrue(parser.lookahead)
+        with self.assertRaises(ValueError):
+            codegen.generate_parser_module(parser)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import grammar_utils
+from conflicts import GrammarConflictError
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR
+from parser_logic import LL1ParserLogic
+from parser_stats import ParserStats
+
+
+def prepared(text):
+    grammar, start, non_terminals = grammar_utils.parse_grammar(text)
+    parser = LL1ParserLogic(grammar, start, non_terminals)
+    parser.compute_first()
+    parser.compute_follow()
+    return parser
+
+
+class ConflictTest(unittest.TestCase):
+    def test_conflicts_are_recorded(self):
+        parser = prepared("S -> A a | a b\nA -> a | ε")
+        parser.build_table()
+        conflict = parser.conflicts[('S', 'a')]
+        self.assertEqual(conflict.productions, [['A', 'a'], ['a', 'b']])
+        self.assertEqual(conflict.kind(), 'FIRST/FIRST')
+        self.assertEqual(parser.conflicts[('A', 'a')].kind(), 'FIRST/FOLLOW')
+
+    def test_strict_raises(self):
+        parser = prepared("S -> A a | a b\nA -> a | ε")
+        with self.assertRaises(GrammarConflictError) as raised:
+            parser.build_table(strict=True)
+        self.assertEqual({(c.non_terminal, c.terminal) for c in raised.exception.conflicts}, {('S', 'a'), ('A', 'a')})
+        self.assertIn("[S, a] FIRST/FIRST conflict", str(raised.exception))
+
+    def test_strict_accepts_ll1(self):
+        parser = analyze_grammar(EXPR)
+        parser.build_table(strict=True)
+        self.assertFalse(parser.conflicts)
+        self.assertTrue(parser.recognize('id * ( id )'))
+
+    def test_failed_strict_build_keeps_the_previous_table(self):
+        parser = prepared("S -> a a | a b")
+        parser.build_table(max_k=2)
+        compiled = parser.compiled
+        stats = parser.stats = ParserStats()
+        with self.assertRaises(GrammarConflictError):
+            parser.build_table(strict=True, max_k=1)
+        self.assertIs(parser.compiled, compiled)
+        self.assertEqual((parser.max_k, parser.conflicts), (2, {}))
+        self.assertEqual(set(parser.lookahead), {('S', 'a')})
+        self.assertTrue(parser.recognize('a b'))
+        self.assertIn('build_table', stats.timings)
+
+        # A parser that never had a table still has none
+        parser = prepared("S -> a a | a b")
+        with self.assertRaises(GrammarConflictError):
+            parser.build_table(strict=True)
+        self.assertIsNone(parser.compiled)
+        self.assertFalse(parser.conflicts)
+        with self.assertRaises(ValueError):
+            parser.recognize('a b')
+
+    def test_lookahead_resolves_before_strict_check(self):
+        parser = prepared("S -> a a | a b")
+        parser.build_table(strict=True, max_k=2)
+        self.assertFalse(parser.conflicts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import random
+import unittest
+
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR
+from parse_trace import ERROR_MISMATCH, ERROR_NO_RULE, TRACE_COMPACT
+
+
+class RecoveryTest(unittest.TestCase):
+    def test_recovery_terminates(self):
+        # Pops on the same token used to cycle on this grammar
+        parser = analyze_grammar("S -> a B S | ε | B c S\nB -> a | ε")
+        rng = random.Random(0)
+        inputs = ['a', 'a a', 'c', 'a c a', '', 'a a c c']
+        inputs += [" ".join(rng.choice(['a', 'c', 'x']) for _ in range(rng.randint(1, 12))) for _ in range(200)]
+        for text in inputs:
+            trace, errors, _ = parser.parse_with_recovery(text, TRACE_COMPACT)
+            tokens = len(text.split())
+            self.assertLessEqual(len(errors), tokens + 1, text)
+            self.assertLess(len(trace), 20 * (tokens + 2), text)
+
+    def test_every_error_is_reported(self):
+        parser = analyze_grammar("P -> S P | ε\nS -> id = E ;\n" + EXPR)
+        _, errors, _ = parser.parse_with_recovery("id = + id ; id = id ; id id = id ;")
+        # Both bad statements are reported once, the good one in between is not
+        self.assertEqual([(error.position, error.token, error.code) for error in errors],
+                         [(2, '+', ERROR_NO_RULE), (10, 'id', ERROR_MISMATCH)])
+        self.assertEqual(errors[1].expected, ['='])
+
+    def test_errors_after_quiet_matches_are_reported(self):
+        parser = analyze_grammar("P -> S P | ε\nS -> id = E ;\n" + EXPR)
+        _, errors, _ = parser.parse_with_recovery("id = id + ; id = id ; id = ) ;")
+        self.assertEqual([error.position for error in errors], [4, 11])
+
+    def test_lookahead_rejection_points_at_the_rejected_token(self):
+        parser = analyze_grammar("S -> A q | B r\nA -> a a\nB -> a b", max_k=2)
+        _, errors, _ = parser.parse_with_recovery("a c r")
+        self.assertEqual([(error.position, error.token, error.code) for error in errors],
+                         [(1, 'c', ERROR_NO_RULE)])
+        self.assertEqual(sorted(errors[0].expected), ['a', 'b'])
+        _, errors, _ = parser.parse_with_recovery("a")
+        self.assertEqual([(error.position, error.token) for error in errors], [(1, '$')])
+        self.assertEqual(parser.parse_with_recovery("a b r")[1], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
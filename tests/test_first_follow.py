@@ -0,0 +1,93 @@
+"""FIRST / FOLLOW against the textbook fixpoint they replaced."""
+import random
+import unittest
+
+import benchmark
+import grammar_utils
+from grammar_samples import EXPR, random_grammars
+from parser_logic import LL1ParserLogic
+
+
+def fixpoint_sets(grammar, start, non_terminals):
+    """Returns: (FIRST, FOLLOW) of the non-terminals by repeating full passes until nothing changes."""
+    productions = [(head, [] if body == ['ε'] else body) for head, bodies in grammar.items() for body in bodies]
+    first = {nt: set() for nt in non_terminals}
+
+    def first_of(body):
+        result = set()
+        for s in body:
+            fs = first[s] if s in non_terminals else {s}
+            result |= fs - {'ε'}
+            if 'ε' not in fs:
+                return result
+        return result | {'ε'}
+
+    changed = True
+    while changed:
+        changed = False
+        for head, body in productions:
+            fs = first_of(body)
+            if not fs <= first[head]:
+                first[head] |= fs
+                changed = True
+
+    follow = {nt: set() for nt in non_terminals}
+    follow[start].add('$')
+    changed = True
+    while changed:
+        changed = False
+        for head, body in productions:
+            for i, s in enumerate(body):
+                if s not in non_terminals:
+                    continue
+                fs = first_of(body[i + 1:])
+                new = (fs - {'ε'}) | (follow[head] if 'ε' in fs else set())
+                if not new <= follow[s]:
+                    follow[s] |= new
+                    changed = True
+    return first, follow
+
+
+def analysis(grammar, start, non_terminals, backend='sets'):
+    parser = LL1ParserLogic(grammar, start, set(non_terminals), backend)
+    parser.compute_first()
+    parser.compute_follow()
+    first = {nt: set(parser.first[nt]) for nt in non_terminals}
+    follow = {nt: set(parser.follow[nt]) for nt in non_terminals}
+    return first, follow
+
+
+class FirstFollowTest(unittest.TestCase):
+    def test_random_grammars_match_fixpoint(self):
+        for seed, grammar, non_terminals in random_grammars(300):
+            self.assertEqual(analysis(grammar, 'N0', non_terminals),
+                             fixpoint_sets(grammar, 'N0', set(non_terminals)), seed)
+
+    def test_line_order_does_not_matter(self):
+        for text in (EXPR, benchmark.expression_grammar(30)[0], benchmark.nullable_chain_grammar(30)[0]):
+            lines = text.split('\n')
+            for ordering in (lines, lines[::-1], random.Random(0).sample(lines, len(lines))):
+                grammar, _, non_terminals = grammar_utils.parse_grammar('\n'.join(ordering))
+                grammar, non_terminals = grammar_utils.transform_grammar(grammar, non_terminals)
+                start = lines[0].split()[0]
+                self.assertEqual(analysis(grammar, start, non_terminals),
+                                 fixpoint_sets(grammar, start, non_terminals))
+
+    def test_second_run_gives_the_same_sets(self):
+        for backend in ('sets', 'bits'):
+            grammar, start, non_terminals = grammar_utils.parse_grammar("S -> A b | c\nA -> a | ε")
+            parser = LL1ParserLogic(grammar, start, non_terminals, backend)
+            parser.compute_first()
+            parser.compute_follow()
+            parser.build_table()
+            table = dict(parser.production_ids)
+            parser.compute_first()
+            parser.compute_follow()
+            parser.build_table()
+            self.assertEqual(set(parser.first['S']), {'a', 'b', 'c'}, backend)
+            self.assertEqual(set(parser.follow['A']), {'b'}, backend)
+            self.assertEqual(dict(parser.production_ids), table, backend)
+
+
+if __name__ == '__main__':
+    unittest.main()
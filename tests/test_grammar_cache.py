@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+
+from grammar_cache import MAGIC, GrammarCache, grammar_hash
+from grammar_samples import EXPR
+
+
+class GrammarCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_entry(self, cache, data):
+        path = cache.path_for(grammar_hash(EXPR))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def test_disk_hit(self):
+        GrammarCache(self.tmp.name).get(EXPR)
+        cache = GrammarCache(self.tmp.name)
+        self.assertTrue(cache.get(EXPR).recognize('id * ( id + id )'))
+        self.assertEqual((cache.disk_hits, cache.misses), (1, 0))
+
+    def test_unloadable_files_are_reanalyzed(self):
+        for data in (b'', MAGIC, MAGIC + b'garbage', MAGIC + b'cgrammar_cache\nNoSuchClass\n.'):
+            cache = GrammarCache(self.tmp.name)
+            self.write_entry(cache, data)
+            self.assertTrue(cache.get(EXPR).recognize('id + id'), data)
+            self.assertEqual((cache.disk_hits, cache.misses), (0, 1), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
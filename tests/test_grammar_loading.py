@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+from grammar_utils import GrammarSyntaxError, SymbolTable, load_grammar, load_grammar_file, parse_grammar
+
+
+class LoadGrammarTest(unittest.TestCase):
+    def assert_error_at(self, lines, line_no):
+        with self.assertRaises(GrammarSyntaxError) as raised:
+            load_grammar(lines)
+        self.assertEqual(raised.exception.line_no, line_no)
+        self.assertTrue(str(raised.exception).startswith(f"line {line_no}: "), str(raised.exception))
+
+    def test_error_line_numbers(self):
+        # Comments and blank lines still count
+        self.assert_error_at(["# comment", "", "S -> a", "A b"], 4)
+        self.assert_error_at(["S -> a", "A B -> b"], 2)
+        self.assert_error_at(["S -> a", "", "", "A -> b |  | c"], 4)
+        self.assert_error_at(["-> a"], 1)
+
+    def test_no_productions(self):
+        for lines in ([], ["# only a comment", ""]):
+            with self.assertRaises(GrammarSyntaxError) as raised:
+                load_grammar(lines)
+            self.assertIsNone(raised.exception.line_no)
+            self.assertTrue(str(raised.exception).startswith("no productions found"))
+
+    def test_lenient_parse_skips_bad_lines(self):
+        grammar, start, non_terminals = parse_grammar("S -> a |\njunk\nA -> b")
+        self.assertEqual(grammar, {'S': [['a'], []], 'A': [['b']]})
+        self.assertEqual((start, non_terminals), ('S', {'S', 'A'}))
+
+    def test_file_is_streamed_and_interned(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'grammar.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write("S -> A b | b\n# A is nullable\nA -> a A | ε\n")
+            symbols = SymbolTable()
+            grammar, start, non_terminals = load_grammar_file(path, symbols)
+        self.assertEqual(start, 'S')
+        self.assertEqual(grammar['A'], [['a', 'A'], ['ε']])
+        self.assertIs(grammar['S'][0][0], grammar['A'][0][1])
+        self.assertEqual(symbols.names, ['S', 'A', 'b', 'a', 'ε'])
+
+        with self.assertRaises(GrammarSyntaxError) as raised:
+            load_grammar(["S -> b", "oops"])
+        self.assertEqual(raised.exception.line, "oops")
+
+
+if __name__ == '__main__':
+    unittest.main()
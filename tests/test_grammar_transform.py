@@ -0,0 +1,43 @@
+import itertools
+import unittest
+
+import grammar_utils
+from grammar_samples import earley, random_grammars
+
+
+class TransformGrammarTest(unittest.TestCase):
+    def test_same_language_without_left_recursion(self):
+        checked = 0
+        for seed, grammar, non_terminals in random_grammars(300, 3):
+            try:
+                new_grammar, new_non_terminals = grammar_utils.transform_grammar(grammar, set(non_terminals))
+            except ValueError:
+                continue
+            checked += 1
+            # Hidden left recursion in heads that were not rewritten is left alone
+            productions = [(head, body) for head, bodies in new_grammar.items() for body in bodies]
+            self.assertFalse(grammar_utils.left_recursive_symbols(productions, set()), seed)
+            for head, bodies in new_grammar.items():
+                starts = [body[0] for body in bodies if body != ['ε']]
+                self.assertEqual(len(starts), len(set(starts)), (seed, head))
+            for length in range(4):
+                for tokens in itertools.product(['a', 'b', 'c'], repeat=length):
+                    self.assertEqual(earley(new_grammar, 'N0', list(tokens)), earley(grammar, 'N0', list(tokens)),
+                                     (seed, tokens))
+        self.assertGreater(checked, 100)
+
+    def test_indirect_left_recursion(self):
+        grammar, _, non_terminals = grammar_utils.parse_grammar("S -> A a | b\nA -> S c | d")
+        new_grammar, _ = grammar_utils.remove_left_recursion(grammar, non_terminals)
+        productions = [(head, body) for head, bodies in new_grammar.items() for body in bodies]
+        self.assertFalse(grammar_utils.left_recursive_symbols(productions, grammar_utils.nullable_symbols(productions)))
+
+    def test_hidden_left_recursion_is_rejected(self):
+        for text in ("A -> A A | ε", "S -> B S a | S b | c\nB -> ε | d"):
+            grammar, _, non_terminals = grammar_utils.parse_grammar(text)
+            with self.assertRaises(ValueError, msg=text):
+                grammar_utils.remove_left_recursion(grammar, non_terminals)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Incremental edits against a full reanalysis of the edited grammar."""
+import random
+import unittest
+
+import benchmark
+import grammar_utils
+import incremental_analysis
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR, random_body, random_grammar, analyzed
+from parser_logic import LL1ParserLogic
+
+
+class IncrementalEditTest(unittest.TestCase):
+    def snapshot(self, parser):
+        first = {s: set(fs) for s, fs in parser.first.items()
+                 if fs and (s in parser.non_terminals or s in parser.terminals)}
+        follow = {s: set(fs) for s, fs in parser.follow.items() if fs and s in parser.non_terminals}
+        rows = {head: row for head, row in parser.production_ids.items() if row}
+        return first, follow, rows, parser.compiled.table, parser.compiled.bodies
+
+    def reanalyzed(self, parser):
+        grammar = {head: [list(body) for body in bodies] for head, bodies in parser.grammar.items()}
+        fresh = LL1ParserLogic(grammar, parser.start_symbol, set(parser.non_terminals))
+        # Same production ids, removed ones included
+        fresh.productions = list(parser.productions)
+        incremental_analysis.full_reanalysis(fresh)
+        return fresh
+
+    def test_edits_match_full_reanalysis(self):
+        for seed in range(150):
+            rng = random.Random(seed)
+            terminals = ['a', 'b', 'c']
+            grammar, non_terminals = random_grammar(rng, 6, terminals)
+            parser = analyzed(grammar, 'N0', non_terminals, rng.choice(['sets', 'bits']))
+            for step in range(5):
+                live = [production for production in parser.productions if production is not None]
+                operation = rng.choice(['add', 'remove', 'replace'])
+                if operation == 'add' or not live:
+                    body = random_body(rng, non_terminals, terminals + ['z'])
+                    parser.add_production(rng.choice(non_terminals), body)
+                elif operation == 'remove':
+                    parser.remove_production(*rng.choice(live))
+                else:
+                    parser.replace_production(*rng.choice(live), random_body(rng, non_terminals, terminals))
+                self.assertEqual(self.snapshot(parser), self.snapshot(self.reanalyzed(parser)), (seed, step))
+
+    def test_shared_parser_is_read_only(self):
+        parser = analyze_grammar(EXPR)
+        parser.shared = True
+        with self.assertRaises(ValueError):
+            parser.add_production('F', 'num')
+        editable = parser.copy()
+        editable.add_production('F', 'num')
+        self.assertTrue(editable.recognize('num + id'))
+
+    def test_edits_in_a_long_chain(self):
+        # FOLLOW flows down the whole E<i> chain, in either line order
+        lines = benchmark.expression_grammar(40)[0].split('\n')
+        for ordering in (lines, lines[::-1]):
+            grammar, _, non_terminals = grammar_utils.parse_grammar('\n'.join(ordering))
+            grammar, non_terminals = grammar_utils.transform_grammar(grammar, non_terminals)
+            parser = analyzed(grammar, 'E0', non_terminals)
+            parser.add_production("E20'", 'zz')
+            self.assertEqual(self.snapshot(parser), self.snapshot(self.reanalyzed(parser)))
+            parser.remove_production('E40', 'id')
+            self.assertEqual(self.snapshot(parser), self.snapshot(self.reanalyzed(parser)))
+
+
+if __name__ == '__main__':
+    unittest.main()
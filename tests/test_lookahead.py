@@ -0,0 +1,107 @@
+"""LL(k) lookahead tries: the language they accept and the FIRST_k / FOLLOW_k behind them."""
+import itertools
+import random
+import unittest
+
+import benchmark
+import grammar_utils
+import lookahead
+from grammar_samples import analyzed, earley, random_grammar, random_grammars
+from incremental_analysis import GrammarIndex
+
+
+def fixpoint_sets_k(parser, k):
+    """Returns: (FIRST_k, FOLLOW_k) of every non-terminal, by full passes until nothing changes."""
+    productions = [p for p in parser.productions if p is not None]
+    first = {t: {(t,)} for t in parser.terminals}
+    first.update((nt, set()) for nt in parser.non_terminals)
+    changed = True
+    while changed:
+        changed = False
+        for head, body in productions:
+            strings = lookahead.first_k_of(first, body, k)
+            if not strings <= first[head]:
+                first[head] |= strings
+                changed = True
+
+    follow = {nt: set() for nt in parser.non_terminals}
+    follow[parser.start_symbol].add(('$',))
+    changed = True
+    while changed:
+        changed = False
+        for head, body in productions:
+            for i, symbol in enumerate(body):
+                if symbol in parser.non_terminals:
+                    rest = lookahead.first_k_of(first, body[i + 1:] or ['ε'], k)
+                    strings = lookahead.concat_k(rest, follow[head], k)
+                    if not strings <= follow[symbol]:
+                        follow[symbol] |= strings
+                        changed = True
+    return first, follow
+
+
+class LookaheadTest(unittest.TestCase):
+    def assert_same_language(self, parser, grammar, terminals, max_length, context):
+        for length in range(max_length + 1):
+            for tokens in itertools.product(terminals, repeat=length):
+                tokens = list(tokens)
+                expected = earley(grammar, parser.start_symbol, tokens)
+                self.assertEqual(parser.recognize(tokens), expected, (context, tokens))
+                self.assertEqual(not parser.parse_with_recovery(tokens)[1], expected, (context, tokens))
+
+    def test_ll_k_matches_earley(self):
+        checked = 0
+        for seed in range(300):
+            rng = random.Random(seed)
+            grammar, non_terminals = random_grammar(rng, 3, ['a', 'b', 'c'])
+            grammar['N0'].append(['c'])
+            try:
+                grammar, non_terminals = grammar_utils.transform_grammar(grammar, set(non_terminals))
+            except ValueError:
+                continue
+            parser = analyzed(grammar, 'N0', non_terminals, max_k=3)
+            if parser.conflicts:
+                continue
+            checked += 1
+            self.assert_same_language(parser, grammar, ['a', 'b', 'c'], 4, seed)
+        self.assertGreater(checked, 50)
+
+    def test_lookahead_cells(self):
+        parser = analyzed(*grammar_utils.parse_grammar("S -> A q | B r\nA -> a a a\nB -> a a b"), max_k=3)
+        self.assertFalse(parser.conflicts)
+        self.assertTrue(parser.lookahead)
+        self.assert_same_language(parser, parser.grammar, ['a', 'b', 'q', 'r'], 4, 'lookahead')
+
+    def test_left_recursive_conflicts_get_no_trie(self):
+        # The trie used to collapse onto N2 -> N2 a, which then expanded forever
+        grammar = {'N0': [['N2', 'N0']], 'N1': [['N1']], 'N2': [['N2', 'a'], ['b']]}
+        parser = analyzed(grammar, 'N0', grammar, max_k=3)
+        self.assertTrue(parser.conflicts)
+        for tokens in (['b'], ['b', 'a'], ['b', 'a', 'b']):
+            self.assertFalse(parser.recognize(tokens))
+
+    def test_sets_match_fixpoint(self):
+        for seed, grammar, non_terminals in random_grammars(200, 4):
+            parser = analyzed(grammar, 'N0', non_terminals)
+            index = GrammarIndex(parser.productions)
+            for k in (2, 3):
+                first, follow = fixpoint_sets_k(parser, k)
+                sets = lookahead.LookaheadSets(parser, index, k)
+                for nt in sorted(parser.non_terminals):
+                    self.assertEqual(sets.first_of([nt]), first[nt], (seed, k, nt))
+                    self.assertEqual(sets.follow_of(nt), follow[nt], (seed, k, nt))
+
+    def test_only_the_conflicted_cells_are_analyzed(self):
+        text = benchmark.expression_grammar(50)[0] + "\nZ -> A a | B b\nA -> q\nB -> q"
+        grammar, start, non_terminals = grammar_utils.parse_grammar(text)
+        grammar, non_terminals = grammar_utils.transform_grammar(grammar, non_terminals)
+        parser = analyzed(grammar, start, non_terminals)
+        sets = lookahead.LookaheadSets(parser, GrammarIndex(parser.productions), 2)
+        self.assertEqual(sets.follow_of('Z'), set())
+        self.assertEqual(sets.first_of(['A', 'a']), {('q', 'a')})
+        self.assertEqual(sets.first_of(['B', 'b']), {('q', 'b')})
+        self.assertEqual(set(sets.first) | set(sets.follow), {'Z', 'A', 'B', 'q', 'a', 'b'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Binary tree files and JSON Lines traces."""
+import io
+import json
+import unittest
+
+import parse_export
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR, tree_tuple
+from parse_trace import TRACE_COMPACT
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = analyze_grammar(EXPR)
+        self.text = "id + id * ( id + id ) * id"
+
+    def test_tree_file_round_trip(self):
+        _, success, root = self.parser.parse_string(self.text, TRACE_COMPACT)
+        self.assertTrue(success)
+        buffer = io.BytesIO()
+        parse_export.write_tree(root, buffer)
+        table, label_ids, child_counts = parse_export.read_tree_arrays(buffer.getvalue())
+        rebuilt = parse_export.tree_from_arrays(table, label_ids, child_counts)
+        self.assertEqual(tree_tuple(rebuilt), tree_tuple(root))
+
+    def test_tree_file_rejects_garbage(self):
+        with self.assertRaises(ValueError):
+            parse_export.read_tree(b'x' * 32)
+
+    def test_streamed_trace_matches_compact_trace(self):
+        trace, success, _ = self.parser.parse_string(self.text, TRACE_COMPACT)
+        streamed = io.StringIO()
+        streamed_success, _, count = parse_export.stream_trace(self.parser, self.text, streamed)
+        written = io.StringIO()
+        parse_export.write_trace_jsonl(trace, written)
+
+        self.assertEqual(streamed_success, success)
+        self.assertEqual(count, len(trace))
+        self.assertEqual(streamed.getvalue(), written.getvalue())
+        steps = [json.loads(line) for line in streamed.getvalue().splitlines()]
+        self.assertEqual([step['action'] for step in steps], [step['action'] for step in trace])
+
+    def test_full_trace_is_refused(self):
+        trace, _, _ = self.parser.parse_string(self.text)
+        with self.assertRaises(TypeError):
+            parse_export.write_trace_jsonl(trace, io.StringIO())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR
+from parse_service import ParseService, ServiceClient
+from parse_trace import TRACE_OFF
+
+INPUTS = ["id + id", "id + * id", "( id ) * id", ")", "", "id id"]
+
+
+class ParseServiceTest(unittest.TestCase):
+    def setUp(self):
+        parser = analyze_grammar(EXPR)
+        self.expected = []
+        for text in INPUTS:
+            _, success, _, pointer = parser._parse(text.split(), TRACE_OFF, False)
+            self.expected.append({'accepted': success, 'position': None if success else pointer})
+
+    def run_service(self, check, workers=0, **options):
+        async def main():
+            service = ParseService(workers, cache_dir=None, batch_size=4, **options)
+            try:
+                await check(service)
+            finally:
+                await service.close()
+        asyncio.run(main())
+
+    def test_parse_many_in_order(self):
+        async def check(service):
+            self.assertEqual(await service.parse_many(EXPR, INPUTS * 3), self.expected * 3)
+            self.assertEqual(await service.parse_many(EXPR, INPUTS * 3), self.expected * 3)
+            self.assertEqual(service.analyses, 1)
+            # One pickled payload serves every worker and batch
+            self.assertEqual(service.payloads, 1)
+        self.run_service(check)
+        self.run_service(check, workers=2)
+
+    def test_recover(self):
+        async def check(service):
+            result = await service.parse(EXPR, "id + * id", recover=True)
+            self.assertFalse(result['accepted'])
+            self.assertEqual(result['position'], 2)
+            self.assertTrue(result['errors'])
+        self.run_service(check)
+
+    def test_grammars_are_read_like_the_gui(self):
+        async def check(service):
+            # An empty alternative is ε, as in analyze_grammar
+            self.assertEqual(await service.parse("S -> a S |", "a a"), {'accepted': True, 'position': None})
+            with self.assertRaises(ValueError):
+                await service.parse("no arrow here", "a")
+        self.run_service(check)
+
+    def test_client_round_trip(self):
+        async def check(service):
+            server = await service.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            client = await ServiceClient.connect(port=port)
+            try:
+                results = await asyncio.gather(*(client.parse(EXPR, text) for text in INPUTS))
+                self.assertEqual(results, self.expected)
+                result = await client.parse(EXPR, ['id', '+'], recover=True)
+                self.assertEqual((result['accepted'], result['position']), (False, 2))
+                with self.assertRaises(RuntimeError):
+                    await client.parse("", "a")
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+        self.run_service(check)
+
+    def test_connection_backpressure(self):
+        async def check(service):
+            answer = service._answer
+            running = []
+            most = 0
+
+            async def counting(line, writer):
+                nonlocal most
+                running.append(line)
+                most = max(most, len(running))
+                try:
+                    await answer(line, writer)
+                finally:
+                    running.remove(line)
+
+            service._answer = counting
+            server = await service.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            client = await ServiceClient.connect(port=port)
+            try:
+                results = await asyncio.gather(*(client.parse(EXPR, text) for text in INPUTS * 5))
+                self.assertEqual(results, self.expected * 5)
+                self.assertEqual(most, 2)
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+        self.run_service(check, connection_pending=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import unittest
+
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR
+from parse_trace import TRACE_FULL
+from parser_logic import read_tokens
+
+
+class ParseTokensTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = analyze_grammar(EXPR)
+
+    def test_generator_is_read_lazily(self):
+        pulled = []
+
+        def tokens():
+            for token in "id + id * id".split():
+                pulled.append(token)
+                yield token
+
+        trace, success, root = self.parser.parse_tokens(tokens())
+        self.assertTrue(success)
+        self.assertIsNone(trace)
+        self.assertIsNone(root)
+        self.assertEqual(pulled, "id + id * id".split())
+
+        # A rejected input stops pulling at the offending token
+        pulled.clear()
+        source = (pulled.append(token) or token for token in "id + + id id id".split())
+        _, success, _ = self.parser.parse_tokens(source)
+        self.assertFalse(success)
+        self.assertEqual(pulled, ['id', '+', '+'])
+
+    def test_same_result_as_parse_string(self):
+        for text in ("( id + id ) * id", "id +", "( id", ""):
+            expected = self.parser.parse_string(text, TRACE_FULL)
+            result = self.parser.parse_tokens(iter(text.split()), TRACE_FULL, True)
+            self.assertEqual(result[:2], expected[:2], text)
+
+    def test_without_tree(self):
+        for text in ("( id + id ) * id", "id +"):
+            trace, success, root = self.parser.parse_string(text, TRACE_FULL, build_tree=False)
+            expected, expected_success, expected_root = self.parser.parse_string(text, TRACE_FULL)
+            self.assertIsNone(root)
+            self.assertEqual((trace, success), (expected, expected_success))
+            self.assertIsNotNone(expected_root)
+
+    def test_recognize(self):
+        self.assertTrue(self.parser.recognize("( id + id ) * id"))
+        self.assertTrue(self.parser.recognize(iter(['id', '*', 'id'])))
+        self.assertFalse(self.parser.recognize("id + * id"))
+        self.assertFalse(self.parser.recognize("id ?"))
+        self.assertFalse(self.parser.recognize(""))
+
+    def test_read_tokens(self):
+        stream = io.StringIO("id +\n\n  ( id *  id )\n")
+        tokens = read_tokens(stream)
+        self.assertEqual(next(tokens), 'id')
+        self.assertEqual(list(tokens), ['+', '(', 'id', '*', 'id', ')'])
+        self.assertTrue(self.parser.parse_tokens(read_tokens(io.StringIO("id +\nid\n")))[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR
+from parse_trace import CHECKPOINT_INTERVAL, TRACE_COMPACT, TRACE_FULL, TRACE_OFF, CompactTrace
+
+
+class CompactTraceTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = analyze_grammar(EXPR)
+        # Long enough for several checkpoints
+        self.text = " + ".join(["( id * id )"] * 800)
+
+    def traces(self, text):
+        full, success, _ = self.parser.parse_string(text, TRACE_FULL)
+        compact, compact_success, _ = self.parser.parse_string(text, TRACE_COMPACT)
+        self.assertEqual(success, compact_success)
+        self.assertIsInstance(compact, CompactTrace)
+        return full, compact
+
+    def test_iteration_matches_full_trace(self):
+        for text in (self.text, "id + * id", "( id", ""):
+            full, compact = self.traces(text)
+            self.assertEqual(len(compact), len(full), text)
+            self.assertEqual(list(compact), full, text)
+
+    def test_steps_across_checkpoints(self):
+        full, compact = self.traces(self.text)
+        self.assertGreater(len(full), 3 * CHECKPOINT_INTERVAL)
+        # Deep pages first, so later reads start from checkpoints made along the way
+        for start in (9000, 3 * CHECKPOINT_INTERVAL - 2, CHECKPOINT_INTERVAL - 1, 0, 2 * CHECKPOINT_INTERVAL):
+            self.assertEqual(compact.steps(start, start + 3), full[start:start + 3], start)
+        self.assertEqual(compact[-1], full[-1])
+        self.assertEqual(compact.steps(len(full) - 1, len(full) + 10), full[-1:])
+        self.assertEqual(compact.steps(5, 5), [])
+
+    def test_input_limit(self):
+        full, compact = self.traces(self.text)
+        step = compact.steps(10, 11, input_limit=3)[0]
+        self.assertEqual(step['stack'], full[10]['stack'])
+        self.assertEqual(step['input'], " ".join(full[10]['input'].split()[:3]) + " ...")
+
+    def test_off(self):
+        trace, success, _ = self.parser.parse_string(self.text, TRACE_OFF)
+        self.assertIsNone(trace)
+        self.assertTrue(success)
+
+
+if __name__ == '__main__':
+    unittest.main()
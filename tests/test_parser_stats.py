@@ -0,0 +1,70 @@
+import unittest
+
+import grammar_utils
+from grammar_samples import EXPR
+from parse_trace import TRACE_FULL
+from parser_logic import LL1ParserLogic
+from parser_stats import PROGRESS_TOKENS, ParserStats
+
+
+class ParserStatsTest(unittest.TestCase):
+    def setUp(self):
+        grammar, start, non_terminals = grammar_utils.parse_grammar(EXPR)
+        grammar, non_terminals = grammar_utils.remove_left_recursion(grammar, non_terminals)
+        self.parser = LL1ParserLogic(grammar, start, non_terminals)
+
+    def analyze(self):
+        for stage in ('compute_first', 'compute_follow', 'build_table'):
+            getattr(self.parser, stage)()
+
+    def test_counters_match_the_trace(self):
+        stages = []
+        stats = ParserStats(callback=lambda stage, seconds, s: stages.append(stage))
+        self.parser.stats = stats
+        self.analyze()
+        self.assertGreater(stats.first_iterations, 0)
+        self.assertGreater(stats.follow_iterations, 0)
+
+        trace, success, _ = self.parser.parse_string("( id + id ) * id", TRACE_FULL)
+        self.assertTrue(success)
+        expansions = [step["action"].split(" -> ")[1].split() for step in trace if " -> " in step["action"]]
+        self.assertEqual(stats.parses, 1)
+        self.assertEqual(stats.parse_steps, len(trace))
+        self.assertEqual(stats.table_lookups, len(expansions))
+        self.assertEqual(stats.stack_pushes, sum(len(body) for body in expansions if body != ['ε']))
+        self.assertEqual(stats.max_stack_depth, max(len(step["stack"].split()) for step in trace))
+
+        self.assertEqual(stages, ['compute_first', 'compute_follow', 'build_table', 'parse'])
+        self.assertEqual(set(stats.timings), set(stages))
+        self.assertTrue(all(seconds >= 0 for seconds in stats.timings.values()))
+        self.assertEqual(stats.as_dict()["parse_steps"], len(trace))
+        self.assertIn("parse_seconds", stats.as_dict())
+
+        # Counters accumulate over parses until reset()
+        self.parser.recognize("id )")
+        self.assertEqual(stats.parses, 2)
+        stats.reset()
+        self.assertEqual(stats.as_dict(), {name: 0 for name in ParserStats.COUNTERS})
+
+    def test_progress(self):
+        done = []
+        self.parser.stats = ParserStats(progress=lambda stage, count: done.append((stage, count)))
+        self.analyze()
+        tokens = " + ".join(["id"] * PROGRESS_TOKENS)
+        self.assertTrue(self.parser.recognize(tokens))
+        self.assertEqual(done, [('parse', PROGRESS_TOKENS)])
+
+    def test_no_stats_collects_nothing(self):
+        stats = ParserStats()
+        self.parser.stats = stats
+        self.analyze()
+        collected = stats.as_dict()
+        self.parser.stats = None
+        self.analyze()
+        self.assertTrue(self.parser.parse_string("id * id", TRACE_FULL)[1])
+        self.assertEqual(stats.as_dict(), collected)
+        self.assertIsNone(self.parser.stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from grammar_cache import analyze_grammar
+from grammar_samples import EXPR
+from parse_trace import TRACE_OFF
+from tree_drawer import TreeLayout
+
+
+def reference_layout(root):
+    """The recursive layout TreeDrawer used before TreeLayout: {node: (x, depth, leaves)}."""
+    result = {}
+    leaves = []
+
+    def assign(node, depth):
+        if not node.children:
+            result[node] = (len(leaves), depth, [len(leaves)])
+            leaves.append(node)
+            return
+        below = []
+        for child in node.children:
+            assign(child, depth + 1)
+            below += result[child][2]
+        first = result[node.children[0]][0]
+        last = result[node.children[-1]][0]
+        result[node] = ((first + last) / 2, depth, below)
+
+    assign(root, 0)
+    return result
+
+
+def preorder(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+class TreeLayoutTest(unittest.TestCase):
+    def test_matches_recursive_layout(self):
+        parser = analyze_grammar(EXPR)
+        for text in ("id", "( id + id ) * id", "id * ( ( id ) + id * id ) + id"):
+            _, success, root = parser.parse_string(text, TRACE_OFF, build_tree=True)
+            self.assertTrue(success)
+            layout = TreeLayout.from_tree(root)
+            expected = reference_layout(root)
+            nodes = list(preorder(root))
+            self.assertEqual(list(layout.labels), [node.label for node in nodes])
+
+            for i, node in enumerate(nodes):
+                x, depth, leaves = expected[node]
+                self.assertEqual(layout.x[i], x, (text, i))
+                self.assertEqual(layout.depth[i], depth, (text, i))
+                self.assertEqual((layout.first_leaf[i], layout.last_leaf[i]), (leaves[0], leaves[-1]), (text, i))
+                self.assertEqual(layout.span(i), len(leaves))
+            self.assertEqual(layout.leaf_count, sum(1 for node in nodes if not node.children))
+            self.assertEqual(layout.max_depth, max(depth for _, depth, _ in expected.values()))
+            for d, level in enumerate(layout.levels):
+                self.assertEqual(list(level), [i for i in range(len(nodes)) if layout.depth[i] == d])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,80 +1,256 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+from parse_export import read_tree, write_tree
+
+
+class TreeLayout:
+    """
+    Flat preorder layout of a parse tree.
+    Node i is described by parallel arrays (label, child count, parent, depth, x, and
+    the range of leaves below it); nodes are also bucketed per depth, left to right,
+    so the nodes inside a rectangle can be found with a bisect per level.
+    x is in leaf units: a leaf sits at its leaf index, an internal node halfway
+    between its first and last child.
+    """
+
+    def __init__(self, labels, child_counts):
+        n = len(labels)
+        self.labels = labels
+        self.child_counts = child_counts
+        self.parent = parent = array('i', [-1]) * n
+        self.depth = depth = array('i', [0]) * n
+        self.x = x = array('d', [0.0]) * n
+        self.first_leaf = first_leaf = array('i', [0]) * n
+        self.last_leaf = last_leaf = array('i', [0]) * n
+        last_child = array('i', [-1]) * n
+
+        # Forward pass: parents, depths, leaf numbers and the per-level buckets
+        self.levels = levels = []
+        self.level_x = level_x = []
+        open_nodes = []
+        remaining = []
+        leaves = 0
+        for i in range(n):
+            if open_nodes:
+                p = open_nodes[-1]
+                parent[i] = p
+                depth[i] = depth[p] + 1
+                last_child[p] = i
+                remaining[-1] -= 1
+                if remaining[-1] == 0:
+                    open_nodes.pop()
+                    remaining.pop()
+            if child_counts[i]:
+                open_nodes.append(i)
+                remaining.append(child_counts[i])
+            else:
+                first_leaf[i] = last_leaf[i] = leaves
+                x[i] = leaves
+                leaves += 1
+
+            d = depth[i]
+            if d == len(levels):
+                levels.append(array('i'))
+                level_x.append(array('d'))
+            levels[d].append(i)
+
+        # Backward pass: children come after their parent in preorder, so walking
+        # backwards places every child before its parent
+        for i in range(n - 1, -1, -1):
+            if child_counts[i]:
+                lc = last_child[i]
+                first_leaf[i] = first_leaf[i + 1]
+                last_leaf[i] = last_leaf[lc]
+                x[i] = (x[i + 1] + x[lc]) / 2
+
+        # Widest subtree (in leaves) per level, used to skip fully collapsed levels
+        self.level_span = []
+        for d, level in enumerate(levels):
+            level_x[d].extend(x[i] for i in level)
+            self.level_span.append(max(last_leaf[i] - first_leaf[i] + 1 for i in level))
+
+        self.leaf_count = leaves
+        self.max_depth = len(levels) - 1
+
+    @classmethod
+    def from_tree(cls, root):
+        """Flattens a TreeNode graph into preorder (label, child count) arrays without recursion."""
+        labels = []
+        child_counts = array('i')
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            labels.append(node.label)
+            child_counts.append(len(node.children))
+            stack.extend(reversed(node.children))
+        return cls(labels, child_counts)
+
+    @classmethod
+    def from_file(cls, path):
+        """Loads a tree written by parse_export.write_tree; the arrays are read as is, no TreeNodes are built."""
+        return cls(*read_tree(path))
+
+    def save(self, path):
+        write_tree(self, path)
+
+    def span(self, i):
+        return self.last_leaf[i] - self.first_leaf[i] + 1
+
+
 class TreeDrawer:
     def __init__(self, canvas):
         self.canvas = canvas
         self.node_radius = 20
         self.level_height = 80
+        self.leaf_width = 60
+        self.margin = 50
+
+        # Zoom; subtrees narrower than collapse_px on screen are drawn as one collapsed node
+        self.scale = 1.0
+        self.min_scale = 0.02
+        self.max_scale = 4.0
+        self.collapse_px = 24
+
+        self.layout = None
+        self.offset_x = 0
+        self._render_pending = False
+
+        canvas.bind("<Configure>", lambda event: self.schedule_render())
+        canvas.bind("<Control-MouseWheel>", lambda event: self.zoom(1.25 if event.delta > 0 else 0.8))
+        canvas.bind("<Control-Button-4>", lambda event: self.zoom(1.25))
+        canvas.bind("<Control-Button-5>", lambda event: self.zoom(0.8))
+
+    def scroll_command(self, setter):
+        """Wraps a scrollbar's set() so the visible part is redrawn whenever the view moves."""
+        def command(first, last):
+            setter(first, last)
+            self.schedule_render()
+        return command
 
     def draw(self, root_node):
         self.canvas.delete("all")
-        if not root_node: return
-
-        # 1. Assign coordinates
-        self.leaves_count = 0
-        self.assign_coords(root_node, 0)
-
-        # Center the tree
-        canvas_width = int(self.canvas['width'])
-        # A simple centering strategy based on number of leaves
-        total_width = max(1, self.leaves_count) * 60
-        start_x = (canvas_width - total_width) // 2
-
-        # 2. Draw Recursive
-        self.draw_recursive(root_node, start_x + 30)
-
-    def assign_coords(self, node, depth):
-        # We don't calculate exact X here, just traverse to count leaves
-        # We will determine X during drawing based on leaf index
-        if not node.children:
-            node.leaf_index = self.leaves_count
-            self.leaves_count += 1
-        else:
-            for child in node.children:
-                self.assign_coords(child, depth + 1)
-
-    def draw_recursive(self, node, offset_x):
-        # Calculate X position:
-        # If leaf: x is based on its index
-        # If internal: x is average of first and last child
-
-        x = self.get_node_x(node) * 60 + offset_x
-        y = self.get_node_depth(node) * self.level_height + 50
-
-        # Draw connections to children
-        if node.children:
-            for child in node.children:
-                child_x = self.get_node_x(child) * 60 + offset_x
-                child_y = self.get_node_depth(child) * self.level_height + 50
-                self.canvas.create_line(x, y + self.node_radius, child_x, child_y - self.node_radius, fill="#555")
-                self.draw_recursive(child, offset_x)
-
-        # Draw Node
-        self.canvas.create_oval(x - self.node_radius, y - self.node_radius,
-                                x + self.node_radius, y + self.node_radius,
-                                fill="#e1f5fe", outline="#0277bd")
-        self.canvas.create_text(x, y, text=node.label, font=("Arial", 10, "bold"))
-
-    def get_node_x(self, node):
-        if not node.children:
-            return node.leaf_index
-        else:
-            # Average of children
-            first = self.get_node_x(node.children[0])
-            last = self.get_node_x(node.children[-1])
-            return (first + last) / 2
-
-    def get_node_depth(self, node, depth=0):
-        # We need to store depth in the node object during assign_coords for efficiency,
-        # but let's just hack it here by traversing up? No, parent pointer missing.
-        # Let's re-traverse or just pass depth in draw_recursive.
-        # Better: Modify assign_coords to store depth.
-        return getattr(node, 'depth', 0)
-
-    # Redefine assign_coords to store depth
-    def assign_coords(self, node, depth):
-        node.depth = depth
-        if not node.children:
-            node.leaf_index = self.leaves_count
-            self.leaves_count += 1
-        else:
-            for child in node.children:
-                self.assign_coords(child, depth + 1)
\ No newline at end of file
+        if not root_node:
+            self.layout = None
+            return
+        self.show_layout(TreeLayout.from_tree(root_node))
+
+    def show_layout(self, layout):
+        """Displays an already computed TreeLayout (e.g. one loaded from disk)."""
+        self.layout = layout
+        self.update_scrollregion()
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self.render()
+
+    def load(self, path):
+        """Displays a tree saved with parse_export.write_tree (or TreeLayout.save)."""
+        self.canvas.delete("all")
+        self.show_layout(TreeLayout.from_file(path))
+
+    def zoom(self, factor):
+        scale = min(self.max_scale, max(self.min_scale, self.scale * factor))
+        if scale == self.scale or self.layout is None:
+            return
+
+        # Keep the middle of the view on the same part of the tree
+        x_first, x_last = self.canvas.xview()
+        y_first, y_last = self.canvas.yview()
+        self.scale = scale
+        self.update_scrollregion()
+        x_first_new, x_last_new = self.canvas.xview()
+        y_first_new, y_last_new = self.canvas.yview()
+        self.canvas.xview_moveto((x_first + x_last) / 2 - (x_last_new - x_first_new) / 2)
+        self.canvas.yview_moveto((y_first + y_last) / 2 - (y_last_new - y_first_new) / 2)
+        self.schedule_render()
+
+    def update_scrollregion(self):
+        layout = self.layout
+        dx = self.leaf_width * self.scale
+        dy = self.level_height * self.scale
+        tree_width = max(0, layout.leaf_count - 1) * dx + 2 * self.margin
+        canvas_width = self._view_width()
+
+        # Center trees narrower than the canvas
+        self.offset_x = self.margin + max(0, (canvas_width - tree_width) // 2)
+        width = max(tree_width, canvas_width)
+        height = layout.max_depth * dy + 2 * self.margin
+        self.canvas.config(scrollregion=(0, 0, width, height))
+
+    def schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self._render_idle)
+
+    def _render_idle(self):
+        self._render_pending = False
+        self.render()
+
+    def render(self):
+        """Redraws only the nodes inside the visible part of the canvas."""
+        canvas = self.canvas
+        canvas.delete("all")
+        layout = self.layout
+        if layout is None:
+            return
+
+        s = self.scale
+        r = self.node_radius * s
+        dx = self.leaf_width * s
+        dy = self.level_height * s
+        offset_x = self.offset_x
+        top = self.margin
+
+        view_w = self._view_width()
+        view_h = max(canvas.winfo_height(), int(canvas['height']))
+        x0 = canvas.canvasx(0)
+        y0 = canvas.canvasy(0)
+
+        # Visible levels, plus one below so edges leaving the view are still drawn;
+        # the x range is widened by a view width on each side for the same reason
+        d_first = max(0, int((y0 - top - r) // dy))
+        d_last = min(layout.max_depth, int((y0 + view_h - top + r) // dy) + 1)
+        lo = (x0 - view_w - offset_x - r) / dx
+        hi = (x0 + 2 * view_w - offset_x + r) / dx
+        min_span = self.collapse_px / dx
+
+        labels = layout.labels
+        parent = layout.parent
+        x = layout.x
+        child_counts = layout.child_counts
+        show_text = 10 * s >= 5
+        font = ("Arial", max(1, int(10 * s)), "bold")
+
+        lines = []
+        nodes = []
+        for d in range(d_first, d_last + 1):
+            # Every node below a collapsed level is hidden, and spans only shrink with depth
+            if d > 0 and layout.level_span[d - 1] < min_span:
+                break
+            level = layout.levels[d]
+            level_x = layout.level_x[d]
+            y = top + d * dy
+            for k in range(bisect_left(level_x, lo), bisect_right(level_x, hi)):
+                i = level[k]
+                p = parent[i]
+                if p >= 0 and layout.span(p) < min_span:
+                    continue  # inside a collapsed subtree
+                node_x = offset_x + x[i] * dx
+                if p >= 0:
+                    lines.append((offset_x + x[p] * dx, y - dy + r, node_x, y - r))
+                collapsed = child_counts[i] and layout.span(i) < min_span
+                nodes.append((node_x, y, labels[i], collapsed))
+
+        for line in lines:
+            canvas.create_line(*line, fill="#555")
+        for node_x, y, label, collapsed in nodes:
+            if collapsed:
+                # Collapsed subtree marker
+                canvas.create_polygon(node_x, y, node_x - r, y + 2 * r, node_x + r, y + 2 * r,
+                                      fill="#b3e5fc", outline="#0277bd")
+            canvas.create_oval(node_x - r, y - r, node_x + r, y + r, fill="#e1f5fe", outline="#0277bd")
+            if show_text:
+                canvas.create_text(node_x, y, text=label, font=font)
+
+    def _view_width(self):
+        return max(self.canvas.winfo_width(), int(self.canvas['width']))